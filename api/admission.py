@@ -0,0 +1,246 @@
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from ultimate_excel_ai.config import settings
+from ultimate_excel_ai.logic import telemetry
+
+MB = 2 ** 20
+# Peak working memory of an operation as a multiple of the dataset's in-memory size
+# (for upload/append: of the uncompressed file size, since parsing and cleaning make several copies)
+OPERATION_COSTS = {
+    'upload': 4.0,
+    'append': 4.0,
+    'predict': 3.0,
+    'forecast': 0.5,
+    'backtest': 0.5,
+    'anomalies': 1.5,
+    'duplicates': 1.0,
+}
+MIN_COST = 16 * MB
+
+class Rejected(Exception):
+    def __init__(self, status, detail, retry_after=None):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+
+class Ticket:
+    def __init__(self, client, operation, cost):
+        self.client = client
+        self.operation = operation
+        self.cost = cost
+        self.started = None
+        self.admitted = False
+        self.future = None
+        self.loop = None
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+class AdmissionController:
+    """
+    Admits heavy operations against global and per-client budgets of concurrent
+    jobs and reserved memory. Jobs that do not fit wait in a FIFO queue (bounded
+    in size and wait time); clients over their own budget are rejected with 429,
+    a full or stalled queue with 503. State is guarded by a thread lock so
+    release() can be called from worker threads.
+    """
+    def __init__(self, max_concurrent, max_memory, client_concurrent, client_memory,
+                 queue_size=32, queue_timeout=30.0):
+        self.max_concurrent = max_concurrent
+        self.max_memory = max_memory
+        self.client_concurrent = client_concurrent
+        self.client_memory = client_memory
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._running = 0
+        self._memory = 0
+        self._clients = {}     # client -> {'running', 'queued', 'memory'}
+        self._durations = {}   # operation -> moving average of run time
+
+    def _client(self, client):
+        return self._clients.setdefault(client, {'running': 0, 'queued': 0, 'memory': 0})
+
+    def _forget(self, client):
+        if not any(self._clients.get(client, {}).values()):
+            self._clients.pop(client, None)
+
+    def _fits(self, ticket):
+        return self._running < self.max_concurrent and self._memory + ticket.cost <= self.max_memory
+
+    def _start(self, ticket):
+        ticket.admitted = True
+        ticket.started = time.perf_counter()
+        self._running += 1
+        self._memory += ticket.cost
+        stats = self._client(ticket.client)
+        stats['running'] += 1
+        stats['memory'] += ticket.cost
+
+    def _promote(self):
+        while self._queue and self._fits(self._queue[0]):
+            ticket = self._queue.popleft()
+            self._client(ticket.client)['queued'] -= 1
+            self._start(ticket)
+            ticket.loop.call_soon_threadsafe(_resolve, ticket.future)
+
+    def retry_after(self, operation, ahead=0):
+        """Seconds until a slot is likely free, from the moving average run time."""
+        average = self._durations.get(operation, 5.0)
+        return int(min(300, max(1, math.ceil(average * (ahead + 1) / self.max_concurrent))))
+
+    def _check(self, ticket):
+        if ticket.cost > min(self.max_memory, self.client_memory):
+            raise Rejected(413, f"'{ticket.operation}' needs ~{ticket.cost // MB} MB, more than the memory budget allows")
+        stats = self._clients.get(ticket.client, {'running': 0, 'queued': 0, 'memory': 0})
+        if stats['running'] + stats['queued'] >= self.client_concurrent:
+            raise Rejected(429, "Too many concurrent jobs for this client", self.retry_after(ticket.operation))
+        if stats['memory'] + ticket.cost > self.client_memory:
+            raise Rejected(429, "Client memory budget exhausted", self.retry_after(ticket.operation))
+        if len(self._queue) >= self.queue_size:
+            raise Rejected(503, "Server busy", self.retry_after(ticket.operation, len(self._queue)))
+
+    async def acquire(self, client, operation, cost):
+        ticket = Ticket(client, operation, cost)
+        with self._lock:
+            self._check(ticket)
+            if not self._queue and self._fits(ticket):
+                self._start(ticket)
+                return ticket
+            ticket.loop = asyncio.get_running_loop()
+            ticket.future = ticket.loop.create_future()
+            self._queue.append(ticket)
+            self._client(client)['queued'] += 1
+        try:
+            await asyncio.wait_for(ticket.future, self.queue_timeout)
+            return ticket
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if not ticket.admitted:
+                    self._queue.remove(ticket)
+                    self._client(client)['queued'] -= 1
+                    self._forget(client)
+                    self._promote()
+            if ticket.admitted:
+                if isinstance(e, asyncio.CancelledError):
+                    self.release(ticket)
+                    raise
+                return ticket  # admitted just as the wait timed out
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise Rejected(503, "Timed out waiting for capacity", self.retry_after(operation, len(self._queue)))
+
+    def release(self, ticket):
+        with self._lock:
+            if not ticket.admitted:
+                return
+            ticket.admitted = False
+            elapsed = time.perf_counter() - ticket.started
+            previous = self._durations.get(ticket.operation)
+            self._durations[ticket.operation] = elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+            self._running -= 1
+            self._memory -= ticket.cost
+            stats = self._client(ticket.client)
+            stats['running'] -= 1
+            stats['memory'] -= ticket.cost
+            self._forget(ticket.client)
+            self._promote()
+
+    def snapshot(self, client=None):
+        with self._lock:
+            load = {
+                'running': self._running,
+                'queued': len(self._queue),
+                'memory_reserved_mb': round(self._memory / MB, 1),
+                'limits': {
+                    'max_concurrent': self.max_concurrent,
+                    'max_memory_mb': self.max_memory // MB,
+                    'client_concurrent': self.client_concurrent,
+                    'client_memory_mb': self.client_memory // MB,
+                    'queue_size': self.queue_size,
+                },
+                'clients': len(self._clients),
+            }
+            if client is not None:
+                stats = self._clients.get(client, {'running': 0, 'queued': 0, 'memory': 0})
+                load['client'] = {'id': client, 'running': stats['running'], 'queued': stats['queued'],
+                                  'memory_reserved_mb': round(stats['memory'] / MB, 1)}
+        return load
+
+CONTROLLER = AdmissionController(
+    settings.ADMISSION_MAX_CONCURRENT, settings.ADMISSION_MAX_MEMORY_MB * MB,
+    settings.ADMISSION_CLIENT_CONCURRENT, settings.ADMISSION_CLIENT_MEMORY_MB * MB,
+    settings.ADMISSION_QUEUE_SIZE, settings.ADMISSION_QUEUE_TIMEOUT,
+)
+# Heavy jobs run here instead of the default thread pool, so cheap endpoints keep their threads
+EXECUTOR = ThreadPoolExecutor(max_workers=settings.ADMISSION_MAX_CONCURRENT, thread_name_prefix="heavy")
+
+def client_id(request):
+    """
+    Key for the per-client budgets: the authenticated user if an auth middleware set one,
+    otherwise the peer address. Headers are client-supplied, so X-Client-ID is honoured only
+    with ADMISSION_TRUST_CLIENT_ID or from a TRUSTED_PROXIES peer, and X-Forwarded-For only
+    from a TRUSTED_PROXIES peer.
+    """
+    user = request.scope.get("user")
+    if getattr(user, "is_authenticated", False):
+        return f"user:{user.display_name}"
+    peer = request.client.host if request.client else "unknown"
+    via_proxy = peer in settings.TRUSTED_PROXIES
+    if via_proxy or settings.ADMISSION_TRUST_CLIENT_ID:
+        header = request.headers.get("x-client-id")
+        if header:
+            return header
+    if via_proxy:
+        # The rightmost address not appended by one of our own proxies is the real peer
+        forwarded = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+        for host in reversed(forwarded):
+            if host not in settings.TRUSTED_PROXIES:
+                return host
+    return peer
+
+def estimate_cost(operation, nbytes):
+    return max(MIN_COST, int(nbytes * OPERATION_COSTS.get(operation, 1.0)))
+
+def _register_gauges(registry):
+    def jobs():
+        load = CONTROLLER.snapshot()
+        return [({'state': 'running'}, load['running']), ({'state': 'queued'}, load['queued'])]
+    registry.gauge_callback("admission_jobs", jobs, help="Heavy jobs running and waiting for admission")
+    registry.gauge_callback("admission_memory_reserved_bytes", lambda: CONTROLLER._memory, help="Memory reserved by admitted jobs")
+
+_register_gauges(telemetry.REGISTRY)
+
+async def run(request, operation, nbytes, fn, *args):
+    """
+    Admits `fn(*args)` as `operation` for the calling client and runs it on the heavy
+    executor. The reservation is released when the work finishes, even if the client
+    has gone away. Rejections become HTTP errors with a Retry-After header.
+    """
+    client = client_id(request)
+    started = time.perf_counter()
+    try:
+        ticket = await CONTROLLER.acquire(client, operation, estimate_cost(operation, nbytes))
+    except Rejected as e:
+        telemetry.REGISTRY.inc("admission_rejections_total", help="Heavy jobs rejected by admission control",
+                               operation=operation, status=str(e.status))
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(status_code=e.status, detail=e.detail, headers=headers)
+    telemetry.REGISTRY.observe("admission_wait_seconds", time.perf_counter() - started,
+                               help="Time heavy jobs waited for admission", operation=operation)
+    try:
+        future = EXECUTOR.submit(contextvars.copy_context().run, fn, *args)
+    except BaseException:
+        CONTROLLER.release(ticket)
+        raise
+    future.add_done_callback(lambda _: CONTROLLER.release(ticket))
+    return await asyncio.wrap_future(future)
@@ -0,0 +1,89 @@
+import cProfile
+import contextvars
+import functools
+import inspect
+import itertools
+import os
+import time
+from ultimate_excel_ai.config import settings
+from ultimate_excel_ai.logic import telemetry
+
+# Set by the middleware for requests that asked to be profiled; endpoints write the dump path into it
+_PROFILE = contextvars.ContextVar("profile_request", default=None)
+_DUMPS = itertools.count(1)
+
+def route_name(request):
+    """Route template (e.g. /api/v1/rows) so metrics labels stay low-cardinality."""
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+def begin_profile(request):
+    """Marks the request for profiling if enabled and requested via `X-Profile: 1`."""
+    if not settings.PROFILING_ENABLED or request.headers.get("x-profile") != "1":
+        return None, None
+    slot = {}
+    return slot, _PROFILE.set(slot)
+
+def end_profile(slot, token, response):
+    if token is None:
+        return
+    _PROFILE.reset(token)
+    if "path" in slot:
+        response.headers["X-Profile-Path"] = slot["path"]
+
+def _dump(profiler, name, slot):
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILE_DIR, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(_DUMPS)}.prof")
+    profiler.dump_stats(path)
+    slot["path"] = path
+
+def profiled(fn):
+    """
+    Runs the endpoint under cProfile when the request was marked by begin_profile
+    and writes a pstats .prof file (viewable with snakeviz, convertible to a
+    flamegraph with flameprof). Sync endpoints are profiled in their worker thread;
+    async ones also capture whatever else runs on the event loop meanwhile.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            slot = _PROFILE.get()
+            if slot is None:
+                return await fn(*args, **kwargs)
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+                _dump(profiler, fn.__name__, slot)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            slot = _PROFILE.get()
+            if slot is None:
+                return fn(*args, **kwargs)
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+                _dump(profiler, fn.__name__, slot)
+    return wrapper
+
+def _threadpool_stats():
+    # Sync endpoints run on anyio's default thread limiter; waiting tasks are queued requests
+    from anyio import to_thread
+    stats = to_thread.current_default_thread_limiter().statistics()
+    return [({"state": "busy"}, stats.borrowed_tokens), ({"state": "waiting"}, stats.tasks_waiting)]
+
+def register_gauges(store, registry=None):
+    """Gauges evaluated when /metrics is scraped."""
+    registry = registry or telemetry.REGISTRY
+    registry.gauge_callback("datasets_stored", lambda: len(store), help="Datasets held in the in-memory store")
+    registry.gauge_callback("dataset_store_bytes", lambda: sum(int(d["df"].memory_usage(index=True).sum()) for d in list(store.values())),
+                            help="Shallow memory of stored DataFrames")
+    registry.gauge_callback("derived_store_bytes", lambda: sum(d["derived"].nbytes for d in list(store.values()) if "derived" in d),
+                            help="Memory of analysis results kept as derived columns")
+    registry.gauge_callback("threadpool_tasks", _threadpool_stats, help="Worker threads in use and requests waiting for one")
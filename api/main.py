@@ -1,12 +1,32 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 import shutil
 import os
-import pandas as pd
-from ultimate_excel_ai.config import settings
-from ultimate_excel_ai.logic import data, ml, analysis, nlu
+import io
+import itertools
+import copy
+import time
+import zipfile
+from ultimate_excel_ai import lazy
+from ultimate_excel_ai.config import settings, ensure_upload_dir
+from ultimate_excel_ai.logic import telemetry
 import logging
-from ultimate_excel_ai.api import schemas
+from ultimate_excel_ai.api import schemas, serialization, instrumentation, admission
+
+# pandas, sklearn and the logic modules load on the first request that needs them,
+# so the app (and its health check) is up quickly
+np = lazy.module("numpy")
+pd = lazy.module("pandas")
+data = lazy.module("ultimate_excel_ai.logic.data")
+ml = lazy.module("ultimate_excel_ai.logic.ml")
+analysis = lazy.module("ultimate_excel_ai.logic.analysis")
+grid = lazy.module("ultimate_excel_ai.logic.grid")
+query = lazy.module("ultimate_excel_ai.logic.query")
+dedup = lazy.module("ultimate_excel_ai.logic.dedup")
+derived = lazy.module("ultimate_excel_ai.logic.derived")
 
 # Logging Setup
 logging.basicConfig(level=logging.INFO)
@@ -27,95 +47,487 @@ app.add_middleware(
 # We store dataframes in a global dict keyed by filename for simplicity in this session
 # In real SaaS, use Redis or a Database with session IDs.
 DATA_STORE = {}
+# Every upload gets a new version; cursors and cached results are bound to it.
+_VERSIONS = itertools.count(1)
+
+instrumentation.register_gauges(DATA_STORE)
+if settings.TRACK_ALLOCATIONS:
+    telemetry.enable_allocation_tracking()
+
+@app.middleware("http")
+async def record_request(request, call_next):
+    """Request span: in-flight gauge, latency histogram and count per route and status."""
+    registry = telemetry.REGISTRY
+    slot, token = instrumentation.begin_profile(request)
+    registry.add("http_requests_in_flight", 1, help="Requests currently being handled")
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        registry.add("http_requests_in_flight", -1)
+        labels = {"method": request.method, "route": instrumentation.route_name(request), "status": str(status)}
+        registry.observe("http_request_duration_seconds", time.perf_counter() - start, help="Request latency", **labels)
+        registry.inc("http_requests_total", help="Requests handled", **labels)
+    instrumentation.end_profile(slot, token, response)
+    return response
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(telemetry.REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def root():
     return {"message": "Ultimate Excel AI Analyst API is running"}
 
 @app.post(f"{settings.API_V1_STR}/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(request: Request, file: UploadFile = File(...), approximate: bool = False):
     try:
         content = await file.read()
         logger.info(f"Received file: {file.filename}, Size: {len(content)} bytes")
+        return await admission.run(request, "upload", expanded_bytes(file.filename, content), ingest_upload, file.filename, content, approximate)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@instrumentation.profiled
+def ingest_upload(filename, content, approximate):
+    # Save to Disk (Temp)
+    file_location = os.path.join(ensure_upload_dir(), filename)
+    with open(file_location, "wb") as f:
+        f.write(content)
         
-        # Save to Disk (Temp)
-        file_location = os.path.join(settings.UPLOAD_DIR, file.filename)
-        with open(file_location, "wb") as f:
-            f.write(content)
-            
-        df, msg = data.load_data(io.BytesIO(content), file.filename)
-        
-        if df is None:
-            logger.error(f"Failed to load data: {msg}")
-            raise HTTPException(status_code=400, detail=msg)
-            
-        # Clean Data
-        df, num, cat, date, stats = data.process_data(df)
-        
-        # Store in memory (and potentially cache on disk via file_location)
-        DATA_STORE[file.filename] = {
-            "df": df,
-            "num": num,
-            "cat": cat,
-            "date": date,
-            "stats": stats
-        }
+    df, msg = data.load_data(io.BytesIO(content), filename)
+    
+    if df is None:
+        logger.error(f"Failed to load data: {msg}")
+        raise HTTPException(status_code=400, detail=msg)
         
-        return {
-            "filename": file.filename, 
-            "status": "success", 
-            "rows": len(df), 
-            "columns": len(df.columns),
-            "stats": stats
-        }
+    # Clean Data (row hashes are kept so later appends dedup against them)
+    row_index = dedup.RowHashIndex()
+    # Approximate datasets keep their imputation sketch so appends can merge into it
+    sketch = data.imputation_sketch() if approximate else None
+    df, num, cat, date, stats = data.process_data(df, approximate=approximate, history=row_index, sketch=sketch)
+    
+    # Store in memory (and potentially cache on disk via file_location)
+    entry = store_dataset(filename, df, num, cat, date, stats, approximate, row_index, sketch)
+    
+    return {
+        "filename": filename, 
+        "status": "success", 
+        "rows": len(df), 
+        "columns": len(df.columns),
+        "stats": stats,
+        "version": entry["version"]
+    }
+
+def store_dataset(filename, df, num, cat, date, stats, approximate, row_index, sketch=None):
+    """
+    Saves the row-hash index and stores `df` as a new version of `filename`.
+    sketch: the DatasetSketch approximate imputation used, merged into on append.
+    """
+    row_index.save(hash_index_path(filename))
+    DATA_STORE[filename] = {
+        "df": df,
+        "num": num,
+        "cat": cat,
+        "date": date,
+        "stats": stats,
+        "approximate": approximate,
+        "row_index": row_index,
+        "sketch": sketch,
+        "nbytes": frame_bytes(df),
+        "version": next(_VERSIONS)
+    }
+    return DATA_STORE[filename]
+
+def frame_bytes(df):
+    """In-memory size used to estimate the cost of jobs on a dataset."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def hash_index_path(filename):
+    # Batch part names may contain archive paths ("regions.zip/north.csv")
+    safe = filename.replace("/", "_").replace("\\", "_")
+    return os.path.join(ensure_upload_dir(), f"{safe}.hashes.npz")
+
+@app.post(f"{settings.API_V1_STR}/upload/batch")
+async def upload_batch(request: Request,
+                       files: List[UploadFile] = File(...),
+                       name: Optional[str] = Query(None, description="Dataset name when concatenating (default: first file name)"),
+                       concat: bool = True,
+                       all_sheets: bool = False,
+                       join: str = Query("outer", pattern="^(outer|inner)$"),
+                       source_column: Optional[str] = None,
+                       approximate: bool = False):
+    """
+    Ingests several files, zip archives and/or every sheet of workbooks, processing the
+    parts in parallel. With concat=True the parts become one dataset (columns aligned
+    by `join`); otherwise every part is stored as its own dataset under its part name.
+    """
+    try:
+        contents = [(f.filename, await f.read()) for f in files]
+        total = sum(len(content) for _, content in contents)
+        # Archives and workbooks are admitted by their decompressed size
+        expanded = await run_in_threadpool(lambda: sum(expanded_bytes(filename, content) for filename, content in contents))
+        logger.info(f"Received batch of {len(contents)} files, Size: {total} bytes ({expanded} uncompressed)")
+        return await admission.run(request, "upload", expanded, ingest_batch, contents, name, concat,
+                                   all_sheets, join, source_column, approximate)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def expanded_bytes(filename, content, size=None):
+    """
+    Size of an uploaded file once decompressed, from the archive directory alone:
+    zip archives count their members' ZipInfo.file_size (xlsx members expanded in
+    turn) and xlsx workbooks, zip packages themselves, their XML parts.
+    content: bytes or a seekable file object of `size` bytes.
+    """
+    size = len(content) if size is None else size
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ('.zip', '.xlsx'):
+        return size
+    try:
+        with zipfile.ZipFile(io.BytesIO(content) if isinstance(content, bytes) else content) as archive:
+            total = 0
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                if ext == '.zip' and member.filename.lower().endswith('.xlsx'):
+                    with archive.open(member) as f:
+                        total += expanded_bytes(member.filename, f, member.file_size)
+                else:
+                    total += member.file_size
+            return total
+    except zipfile.BadZipFile:
+        return size  # rejected when the batch is parsed
+
+@instrumentation.profiled
+def ingest_batch(contents, name, concat, all_sheets, join, source_column, approximate):
+    upload_dir = ensure_upload_dir()
+    for filename, content in contents:
+        with open(os.path.join(upload_dir, filename), "wb") as f:
+            f.write(content)
+    
+    try:
+        # Concatenated parts are imputed after cross-part dedup (see data.combine_parts)
+        parts = data.load_batch(contents, approximate=approximate, all_sheets=all_sheets, impute=not concat)
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {e}")
+    report = [{"name": p['name'], "error": p['error']} if 'error' in p else
+              {"name": p['name'], "rows": len(p['df']), "columns": len(p['df'].columns), "stats": p['stats']}
+              for p in parts]
+    
+    datasets = []
+    if concat:
+        filename = name or contents[0][0]
+        row_index = dedup.RowHashIndex()
+        sketch = data.imputation_sketch() if approximate else None
+        df, num, cat, date, stats = data.combine_parts(parts, join=join, source_column=source_column, history=row_index,
+                                                       sketch=sketch)
+        entry = store_dataset(filename, df, num, cat, date, stats, approximate, row_index, sketch)
+        datasets.append({"filename": filename, "rows": len(df), "columns": len(df.columns), "stats": stats, "version": entry["version"]})
+    else:
+        for p in parts:
+            if 'df' not in p:
+                continue
+            entry = store_dataset(p['name'], p['df'], p['num'], p['cat'], p['date'], p['stats'], approximate, p['row_index'],
+                                  p['sketch'])
+            datasets.append({"filename": p['name'], "rows": len(p['df']), "columns": len(p['df'].columns), "stats": p['stats'], "version": entry["version"]})
+        if not datasets:
+            raise ValueError("None of the batch parts could be loaded")
+    
+    return {"status": "success", "datasets": datasets, "parts": report}
+
+@app.post(f"{settings.API_V1_STR}/append")
+async def append_file(request: Request, filename: str, file: UploadFile = File(...)):
+    """Appends a file to an uploaded dataset, dropping rows already present (by row hash)."""
+    d = get_data(filename)
+    try:
+        content = await file.read()
+        logger.info(f"Appending {file.filename} to {filename}, Size: {len(content)} bytes")
+        return await admission.run(request, "append", expanded_bytes(file.filename, content), append_rows, filename, d, file.filename, content)
+    except HTTPException:
+        raise
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Schema mismatch: {e.args[0]}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@instrumentation.profiled
+def append_rows(filename, d, source_name, content):
+    df, msg = data.load_data(io.BytesIO(content), source_name)
+    if df is None:
+        raise HTTPException(status_code=400, detail=msg)
+    
+    row_index = d.get("row_index")
+    if row_index is None:
+        row_index = dedup.RowHashIndex.load(hash_index_path(filename))
+    # Imputation uses the dataset's sketch merged with the new rows; the stored one is left as is
+    sketch = None
+    if d['approximate']:
+        sketch = copy.deepcopy(d['sketch']) if d.get('sketch') is not None else data.imputation_sketch()
+    df, _, _, _, stats = data.process_data(df, approximate=d['approximate'], history=row_index,
+                                           sketch=sketch, earlier=d['df'])
+    
+    combined = pd.concat([d['df'], df], ignore_index=True)
+    # New version: cached grids, query engines and analysis results are dropped
+    entry = store_dataset(filename, combined, d['num'], d['cat'], d['date'], d['stats'], d['approximate'], row_index, sketch)
+    return {
+        "filename": filename,
+        "status": "success",
+        "rows_added": len(df),
+        "rows": len(combined),
+        "stats": stats,
+        "version": entry["version"]
+    }
+
 def get_data(filename):
     if filename not in DATA_STORE:
         raise HTTPException(status_code=404, detail="File not found")
     return DATA_STORE[filename]
 
+def dataset_bytes(d):
+    return d.get("nbytes") or frame_bytes(d['df'])
+
+def derived_columns(d):
+    """Analysis results of this dataset version; a new upload/append starts an empty one."""
+    return d.get("derived") or d.setdefault("derived", derived.DerivedColumns(d['df'], d['version']))
+
+def derived_view(d, rows, fields, names):
+    """Dataset rows joined with derived columns `names`; `fields` may list base and derived columns."""
+    fields = serialization.parse_fields(fields)
+    if fields is not None:
+        names = [n for n in names if n in fields]
+        fields = [f for f in fields if f not in names]
+    return derived_columns(d).view(rows, fields, names)
+
+@app.get(f"{settings.API_V1_STR}/load")
+def current_load(request: Request):
+    """Admission-control state: running and queued heavy jobs, reserved memory and limits."""
+    return admission.CONTROLLER.snapshot(admission.client_id(request))
+
 @app.post(f"{settings.API_V1_STR}/analyze", response_model=schemas.InsightResponse)
-def analyze_data(filename: str):
+@instrumentation.profiled
+def analyze_data(filename: str, approximate: Optional[bool] = None):
     logger.info(f"Analyzing {filename}")
     d = get_data(filename)
-    insights = analysis.generate_insights(d['df'], d['num'], d['date'])
+    # Defaults to the mode the dataset was uploaded with
+    approximate = d['approximate'] if approximate is None else approximate
+    insights = analysis.generate_insights(d['df'], d['num'], d['date'], approximate=approximate)
     return {"insights": insights}
 
 @app.post(f"{settings.API_V1_STR}/predict", response_model=schemas.PredictionResponse)
-def predict(req: schemas.PredictionRequest):
+async def predict(req: schemas.PredictionRequest, request: Request):
     d = get_data(req.filename)
     if req.target_column not in d['df'].columns:
          raise HTTPException(status_code=400, detail="Target column not found")
          
-    engine = ml.MachineLearningEngine()
-    model, metrics = engine.train_predictor(d['df'], req.target_column)
+    metrics = await admission.run(request, "predict", dataset_bytes(d), train_model, d, req.target_column)
     return {"model_type": metrics.get('type'), "metrics": metrics}
 
-@app.post(f"{settings.API_V1_STR}/forecast", response_model=schemas.ForecastResponse)
-def forecast(req: schemas.ForecastRequest):
-    d = get_data(req.filename)
+@instrumentation.profiled
+def train_model(d, target_column):
     engine = ml.MachineLearningEngine()
-    forecast_df = engine.forecast_series(d['df'], req.date_column, req.target_column, req.periods)
+    # Held-out predictions/residuals are kept as derived columns, see /derived
+    model, metrics = engine.train_predictor(d['df'], target_column, derived=derived_columns(d))
+    return metrics
+
+def page_response(d, frame, positions, envelope, key, cursor, limit, fields, fmt, derived=None):
+    """
+    Serializes one cursor page of `frame` rows at `positions` (None = all rows).
+    derived: names of derived columns to join onto the page (frame must be d['df']).
+    """
+    total = len(frame) if positions is None else len(positions)
+    try:
+        start, stop, next_cursor = serialization.paginate(total, cursor, limit, d['version'])
+        if derived is not None:
+            rows = derived_view(d, np.arange(start, stop) if positions is None else positions[start:stop], fields, derived)
+        else:
+            frame = serialization.select_fields(frame, fields)
+            rows = frame.iloc[start:stop] if positions is None else frame.iloc[positions[start:stop]]
+        return serialization.frame_response(rows, {**envelope, "next_cursor": next_cursor}, key, fmt)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+@app.post(f"{settings.API_V1_STR}/forecast", responses={200: {"model": schemas.ForecastResponse}})
+async def forecast(req: schemas.ForecastRequest, request: Request):
+    d = get_data(req.filename)
+    # Kept with the dataset version's derived results so paging does not refit the model
+    layer = derived_columns(d)
+    key = ('forecast', req.date_column, req.target_column, req.periods)
+    telemetry.cache_access("api.forecasts", layer.has_table(key))
+    if not layer.has_table(key):
+        layer.set_table(key, await admission.run(request, "forecast", dataset_bytes(d), fit_forecast, d, *key[1:]))
+    forecast_df = layer.table(key)
     
     if forecast_df is None:
         raise HTTPException(status_code=400, detail="Could not generate forecast")
         
-    return {"forecast": forecast_df.to_dict(orient="records")}
+    return page_response(d, forecast_df, None, {"total": len(forecast_df)}, "forecast",
+                         req.cursor, req.limit, req.fields, req.format)
 
-@app.post(f"{settings.API_V1_STR}/anomalies", response_model=schemas.AnomalyResponse)
-def detect_anomalies(filename: str):
-    d = get_data(filename)
+@instrumentation.profiled
+def fit_forecast(d, date_column, target_column, periods):
+    engine = ml.MachineLearningEngine()
+    return engine.forecast_series(d['df'], date_column, target_column, periods, series=lagged_series(d, date_column, target_column))
+
+def lagged_series(d, date_column, target_column):
+    """Aggregated series + lag matrix, built once per dataset version and column pair."""
+    cache = d.setdefault("series", {})
+    key = (date_column, target_column)
+    telemetry.cache_access("api.series", key in cache)
+    if key not in cache:
+        for col in key:
+            if col not in d['df'].columns:
+                raise HTTPException(status_code=400, detail=f"Unknown column: {col}")
+        cache[key] = ml.prepare_series(d['df'], date_column, target_column)
+    return cache[key]
+
+@app.post(f"{settings.API_V1_STR}/backtest", responses={200: {"model": schemas.BacktestResponse}})
+async def backtest(req: schemas.BacktestRequest, request: Request):
+    """Rolling-origin accuracy of the forecaster: per-horizon MAE/MAPE over `folds` origins."""
+    d = get_data(req.filename)
+    result = await admission.run(request, "backtest", dataset_bytes(d), run_backtest, d,
+                                 req.date_column, req.target_column, req.horizon, req.folds, req.step)
+    if result is None:
+        raise HTTPException(status_code=400, detail="Series too short for the requested horizon and folds")
+    metrics, predictions = result
+    envelope = {
+        "folds": int(metrics['folds'].iloc[0]),
+        # MAPE is NaN (-> null) when every actual at that horizon is zero
+        "metrics": [{"horizon": int(h), "mae": float(mae), "mape": float(mape) if mape == mape else None, "folds": int(n)}
+                    for h, mae, mape, n in metrics.itertuples(index=False)],
+    }
+    try:
+        return serialization.frame_response(predictions, envelope, "predictions", req.format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+@instrumentation.profiled
+def run_backtest(d, date_column, target_column, horizon, folds, step):
     engine = ml.MachineLearningEngine()
-    df_anom = engine.detect_anomalies(d['df'].copy(), d['num'])
+    return engine.backtest_series(d['df'], date_column, target_column, horizon=horizon, folds=folds, step=step,
+                                  series=lagged_series(d, date_column, target_column))
+
+@app.post(f"{settings.API_V1_STR}/anomalies", responses={200: {"model": schemas.AnomalyResponse}})
+async def detect_anomalies(request: Request,
+                           filename: str,
+                           limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+                           cursor: Optional[str] = None,
+                           fields: Optional[str] = Query(None, description="Comma-separated column names"),
+                           format: str = "json"):
+    d = get_data(filename)
+    layer = derived_columns(d)
+    telemetry.cache_access("api.anomalies", "Is_Anomaly" in layer)
+    if "Is_Anomaly" not in layer:
+        await admission.run(request, "anomalies", dataset_bytes(d), score_anomalies, d)
+    positions = layer.positions("Is_Anomaly")
     
-    anoms = df_anom[df_anom['Is_Anomaly'] == True]
+    return page_response(d, d['df'], positions, {"anomaly_count": len(positions)}, "anomalies",
+                         cursor, limit, fields, format, derived=["Anomaly_Score"])
+
+@instrumentation.profiled
+def score_anomalies(d):
+    """Stores Is_Anomaly flags and Anomaly_Score as derived columns (the dataset is not copied)."""
+    engine = ml.MachineLearningEngine()
+    result = engine.score_anomalies(d['df'], d['num'])
+    n = len(d['df'])
+    flags, scores = result if result is not None else (np.zeros(n, dtype=bool), np.full(n, np.nan, dtype=np.float32))
+    layer = derived_columns(d)
+    layer.set("Anomaly_Score", scores)
+    layer.set("Is_Anomaly", flags)
+
+@app.post(f"{settings.API_V1_STR}/derived", responses={200: {"model": schemas.DerivedResponse}})
+@instrumentation.profiled
+def derived_rows(filename: str,
+                 columns: Optional[str] = Query(None, description="Comma-separated derived columns (default: all)"),
+                 where: Optional[str] = Query(None, description="Only rows where this derived column is True (boolean) or set"),
+                 limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+                 cursor: Optional[str] = None,
+                 fields: Optional[str] = Query(None, description="Comma-separated base and derived column names"),
+                 format: str = "json"):
+    """Dataset rows joined with stored analysis results (anomaly flags/scores, predictions, residuals)."""
+    d = get_data(filename)
+    layer = derived_columns(d)
+    names = serialization.parse_fields(columns) or layer.names()
+    try:
+        positions = None if where is None else layer.positions(where)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+    total = len(d['df']) if positions is None else len(positions)
+    return page_response(d, d['df'], positions, {"total": total, "columns": names}, "rows",
+                         cursor, limit, fields, format, derived=names)
+
+@app.post(f"{settings.API_V1_STR}/rows", responses={200: {"model": schemas.RowsResponse}})
+@instrumentation.profiled
+def query_rows(req: schemas.RowsRequest):
+    d = get_data(req.filename)
+    # Column indexes live with the dataset entry, i.e. one grid per dataset version
+    telemetry.cache_access("api.grid", "grid" in d)
+    if "grid" not in d:
+        d["grid"] = grid.DataGrid(d['df'])
+    sort = [(s.column, s.descending) for s in req.sort]
+    filters = [(f.column, f.op, (f.min, f.max) if f.op == "range" else f.value) for f in req.filters]
+    try:
+        total, rows = d["grid"].query(sort, filters, req.offset, req.limit, req.fields)
+        return serialization.frame_response(rows, {"total": total, "offset": req.offset}, "rows", req.format)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+@app.post(f"{settings.API_V1_STR}/query", responses={200: {"model": schemas.QueryResponse}})
+@instrumentation.profiled
+def run_query(req: schemas.QueryRequest):
+    d = get_data(req.filename)
+    telemetry.cache_access("api.query_engine", "query_engine" in d)
+    if "query_engine" not in d:
+        d["query_engine"] = query.QueryEngine(d['df'], d['num'], d['cat'], d['date'], version=d['version'])
+    try:
+        result = d["query_engine"].ask(req.query)
+        if result is None:
+            raise HTTPException(status_code=422, detail="Could not understand the query. Try e.g. 'sum of sales by region where year = 2024'.")
+        envelope = {"query": result.query, "plan": result.plan.to_dict(), "source": result.source, "cached": result.cached}
+        return serialization.frame_response(result.frame, envelope, "result", req.format)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+@app.post(f"{settings.API_V1_STR}/duplicates", response_model=schemas.DuplicateResponse)
+async def find_duplicates(req: schemas.DuplicateRequest, request: Request):
+    d = get_data(req.filename)
+    try:
+        report = await admission.run(request, "duplicates", dataset_bytes(d), duplicate_report, d, req.subset, req.verify)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
     return {
-        "anomaly_count": len(anoms),
-        "anomalies": anoms.head(100).to_dict(orient="records") # Limit return size
+        "duplicate_rows": report.count,
+        "group_count": report.group_count,
+        "groups": [g.tolist() for g in report.groups(req.limit)]
     }
 
+@instrumentation.profiled
+def duplicate_report(d, subset, verify):
+    return dedup.find_duplicates(d['df'], subset=subset, verify=verify)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("ultimate_excel_ai.api.main:app", host="0.0.0.0", port=8000, reload=True)
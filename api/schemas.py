@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Union
+from ultimate_excel_ai.config import settings
 
 class InsightResponse(BaseModel):
     insights: List[str]
@@ -10,17 +11,102 @@ class PredictionRequest(BaseModel):
 
 class PredictionResponse(BaseModel):
     model_type: str
-    metrics: Dict[str, float]
+    metrics: Dict[str, Union[float, str]]
 
 class ForecastRequest(BaseModel):
     filename: str
     date_column: str
     target_column: str
     periods: int = 30
+    # Paging / projection of the forecast frame
+    fields: Optional[List[str]] = None
+    limit: int = Field(1000, ge=1, le=settings.MAX_PAGE_SIZE)
+    cursor: Optional[str] = None
+    format: str = "json"
 
+# Frames are returned column-oriented: {column: [values...]}
 class ForecastResponse(BaseModel):
-    forecast: List[Dict[str, Any]]
+    total: int
+    next_cursor: Optional[str] = None
+    forecast: Dict[str, List[Any]]
+
+class BacktestRequest(BaseModel):
+    filename: str
+    date_column: str
+    target_column: str
+    horizon: int = Field(7, ge=1, le=365)
+    folds: int = Field(5, ge=1, le=100)
+    step: Optional[int] = Field(None, ge=1, description="Spacing of fold origins (default: horizon)")
+    format: str = "json"
+
+class HorizonMetrics(BaseModel):
+    horizon: int
+    mae: float
+    mape: Optional[float] = None
+    folds: int
+
+class BacktestResponse(BaseModel):
+    folds: int
+    metrics: List[HorizonMetrics]
+    # Every fold's forecasts: origin, date, horizon, actual, forecast
+    predictions: Dict[str, List[Any]]
 
 class AnomalyResponse(BaseModel):
     anomaly_count: int
-    anomalies: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    anomalies: Dict[str, List[Any]]
+
+class DerivedResponse(BaseModel):
+    total: int
+    columns: List[str]
+    next_cursor: Optional[str] = None
+    rows: Dict[str, List[Any]]
+
+
+class SortSpec(BaseModel):
+    column: str
+    descending: bool = False
+
+class FilterSpec(BaseModel):
+    column: str
+    op: str = "eq"  # eq | in | range | contains
+    value: Optional[Any] = None
+    min: Optional[Any] = None  # range bounds (inclusive)
+    max: Optional[Any] = None
+
+class RowsRequest(BaseModel):
+    filename: str
+    offset: int = Field(0, ge=0)
+    limit: int = Field(100, ge=1, le=settings.MAX_PAGE_SIZE)
+    sort: List[SortSpec] = []
+    filters: List[FilterSpec] = []
+    fields: Optional[List[str]] = None
+    format: str = "json"
+
+class RowsResponse(BaseModel):
+    total: int
+    offset: int
+    rows: Dict[str, List[Any]]
+
+class QueryRequest(BaseModel):
+    filename: str
+    query: str
+    format: str = "json"
+
+class QueryResponse(BaseModel):
+    query: str
+    plan: Dict[str, Any]
+    source: str
+    cached: bool
+    result: Dict[str, List[Any]]
+
+class DuplicateRequest(BaseModel):
+    filename: str
+    subset: Optional[List[str]] = None  # key columns; all columns if omitted
+    verify: bool = False
+    limit: int = Field(100, ge=1, le=settings.MAX_PAGE_SIZE)
+
+class DuplicateResponse(BaseModel):
+    duplicate_rows: int
+    group_count: int
+    groups: List[List[int]]  # row positions, first one is kept
@@ -0,0 +1,141 @@
+import base64
+import binascii
+import json
+from fastapi import Response
+from ultimate_excel_ai import lazy
+
+np = lazy.module("numpy")
+pd = lazy.module("pandas")
+
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def _pyarrow():
+    # Optional binary format; imported on first Arrow response
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow
+
+def _orjson():
+    # Optional fast exact float encoder; json.dumps is used without it
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+def encode_cursor(version, offset):
+    """Opaque page cursor bound to a dataset version."""
+    raw = json.dumps({"v": version, "o": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, version):
+    """Returns the row offset stored in a cursor. Raises ValueError if invalid or stale."""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        offset = int(payload["o"])
+        cursor_version = payload["v"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_version != version:
+        raise ValueError("Cursor refers to an older version of this dataset")
+    if offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+def paginate(total, cursor, limit, version):
+    """Resolves a cursor into (start, stop, next_cursor) over `total` rows."""
+    start = min(decode_cursor(cursor, version), total)
+    stop = min(start + limit, total)
+    next_cursor = encode_cursor(version, stop) if stop < total else None
+    return start, stop, next_cursor
+
+def parse_fields(fields):
+    """Accepts a comma-separated string or a list of column names."""
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    fields = [f.strip() for f in fields if f and f.strip()]
+    return fields or None
+
+def select_fields(df, fields):
+    """Column projection. Raises KeyError listing unknown columns."""
+    fields = parse_fields(fields)
+    if fields is None:
+        return df
+    missing = [f for f in fields if f not in df.columns]
+    if missing:
+        raise KeyError(f"Unknown fields: {', '.join(missing)}")
+    return df[fields]
+
+def column_to_json(series):
+    """
+    JSON array of a column's values. Floats are encoded with the shortest repr that
+    round-trips (pandas' encoder rounds to at most 15 decimals) and NaN/inf as null;
+    nullable integers stay integers. Other columns use pandas' C JSON encoder.
+    """
+    if pd.api.types.is_float_dtype(series.dtype):
+        if isinstance(series.dtype, np.dtype):
+            values = np.ascontiguousarray(series.to_numpy())
+        else:
+            values = series.to_numpy(dtype=float, na_value=np.nan)
+        orjson = _orjson()
+        if orjson is not None:
+            return orjson.dumps(values, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        finite = np.isfinite(values)
+        if not finite.all():
+            values = values.astype(object)
+            values[~finite] = None
+        return json.dumps(values.tolist())
+    if pd.api.types.is_integer_dtype(series.dtype) and series.hasnans:
+        return json.dumps(series.to_numpy(dtype=object, na_value=None).tolist())
+    return series.to_json(orient="values", date_format="iso", double_precision=15)
+
+def frame_to_json(df):
+    """
+    Serializes a DataFrame column-by-column ({column: [values...]}) with column_to_json.
+    Avoids building one Python dict per row.
+    """
+    parts = []
+    for i, col in enumerate(df.columns):
+        parts.append(json.dumps(str(col)) + ":" + column_to_json(df.iloc[:, i]))
+    return "{" + ",".join(parts) + "}"
+
+def frame_to_arrow(df, metadata=None):
+    """Serializes a DataFrame as an Arrow IPC stream. Requires pyarrow."""
+    pa = _pyarrow()
+    if pa is None:
+        raise RuntimeError("Arrow format requires the optional 'pyarrow' package")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"envelope": json.dumps(metadata).encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def frame_response(df, envelope, key, fmt="json"):
+    """
+    Builds a response holding `df` under `key` next to the scalar `envelope` fields.
+    JSON bodies are assembled from pre-encoded columns; 'arrow' returns the frame as an
+    Arrow stream with the envelope in the schema metadata and X-* headers.
+    """
+    if fmt == "arrow":
+        headers = {}
+        if envelope.get("next_cursor"):
+            headers["X-Next-Cursor"] = envelope["next_cursor"]
+        if "total" in envelope:
+            headers["X-Total-Count"] = str(envelope["total"])
+        return Response(content=frame_to_arrow(df, envelope), media_type=ARROW_MEDIA_TYPE, headers=headers)
+    if fmt != "json":
+        raise ValueError(f"Unsupported format: {fmt}")
+    head = json.dumps(envelope, default=str)[:-1]
+    sep = "," if envelope else ""
+    body = head + sep + json.dumps(key) + ":" + frame_to_json(df) + "}"
+    return Response(content=body, media_type=JSON_MEDIA_TYPE)
@@ -0,0 +1,71 @@
+import io
+import numpy as np
+import pandas as pd
+
+REGIONS = ['North', 'South', 'East', 'West']
+CATEGORIES = {
+    'Furniture': ['Bookcases', 'Chairs', 'Tables', 'Furnishings'],
+    'Office Supplies': ['Labels', 'Paper', 'Binders', 'Storage', 'Art'],
+    'Technology': ['Phones', 'Accessories', 'Machines', 'Copiers'],
+}
+
+# Excel sheets hold at most 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1_048_575
+
+def make_sales_data(rows, extra_numeric=0, extra_categorical=0, missing_rate=0.02,
+                    duplicate_rate=0.01, seed=42):
+    """
+    Synthetic dataset shaped like sample_sales_data.xlsx: raw column names
+    ("Order Date", "Sub-Category", ...), dates, categories, correlated numerics,
+    injected NaNs and exact duplicate rows. Width grows with extra_* columns.
+    """
+    rng = np.random.default_rng(seed)
+    n_dups = int(rows * duplicate_rate)
+    n = rows - n_dups
+
+    categories = np.array(list(CATEGORIES))
+    cat_idx = rng.integers(0, len(categories), n)
+    sub_lookup = [np.array(CATEGORIES[c]) for c in categories]
+    sub_pick = rng.integers(0, 4, n)
+    sub = np.empty(n, dtype=object)
+    for i, subs in enumerate(sub_lookup):
+        sel = cat_idx == i
+        sub[sel] = subs[sub_pick[sel] % len(subs)]
+
+    quantity = rng.integers(1, 16, n)
+    sales = np.round(rng.gamma(2.0, 600.0, n) + quantity * 15, 2)
+    discount = np.round(rng.uniform(0, 0.3, n), 2)
+    profit = np.round(sales * (0.35 - discount) + rng.normal(0, 60, n), 2)
+
+    df = pd.DataFrame({
+        'Order Date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, n), unit='D'),
+        'Region': np.array(REGIONS, dtype=object)[rng.integers(0, len(REGIONS), n)],
+        'Category': categories.astype(object)[cat_idx],
+        'Sub-Category': sub,
+        'Sales': sales,
+        'Quantity': quantity,
+        'Discount': discount,
+        'Profit': profit,
+    })
+    for i in range(extra_numeric):
+        df[f'Metric {i + 1}'] = np.round(rng.normal(100, 25, n), 3)
+    for i in range(extra_categorical):
+        df[f'Segment {i + 1}'] = np.array([f'S{i + 1}-{k}' for k in range(20)], dtype=object)[rng.integers(0, 20, n)]
+
+    # Missing values in a few numeric and categorical columns
+    for col in ['Sales', 'Region', 'Discount'] + [f'Metric {i + 1}' for i in range(extra_numeric)][:2]:
+        df.loc[rng.random(n) < missing_rate, col] = np.nan
+
+    if n_dups:
+        df = pd.concat([df, df.iloc[rng.integers(0, n, n_dups)]], ignore_index=True)
+    return df
+
+def to_csv_bytes(df):
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+def to_xlsx_bytes(df):
+    buffer = io.BytesIO()
+    df.iloc[:XLSX_MAX_ROWS].to_excel(buffer, index=False)
+    return buffer.getvalue()
@@ -0,0 +1,106 @@
+"""
+Cold-import budget check for the app entry points.
+
+    python -m ultimate_excel_ai.benchmarks.import_budget
+    python -m ultimate_excel_ai.benchmarks.import_budget --only api --max-seconds api=0.8
+
+Each target is imported in fresh interpreters (--repeat times, median taken).
+The check fails (exit status 1) if a target is slower than its budget or if it
+pulled in a module that must only load on first use (sklearn, plotly, ...).
+Targets whose own dependencies are missing (e.g. streamlit) are skipped.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# name -> (module, default budget in seconds, modules that must not be imported)
+TARGETS = {
+    'api': ('ultimate_excel_ai.api.main', 1.5, ('sklearn', 'scipy', 'plotly', 'pandas', 'pyarrow', 'streamlit')),
+    'dashboard': ('ultimate_excel_ai.ui.dashboard', 3.0, ('sklearn', 'scipy', 'plotly')),
+    'config': ('ultimate_excel_ai.config', 0.2, ('numpy', 'pandas', 'fastapi')),
+}
+
+# Directory containing the ultimate_excel_ai package, so probes run from any cwd
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_PROBE = """
+import json, os, sys, time
+before = set(os.listdir('.'))
+start = time.perf_counter()
+try:
+    import {module}
+except ImportError as e:
+    print(json.dumps({{'skipped': str(e)}}))
+    sys.exit(0)
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(m.split('.')[0] for m in sys.modules),
+                  'created': sorted(set(os.listdir('.')) - before)}}))
+"""
+
+def probe(module, cwd):
+    """Imports `module` in a new interpreter; returns the probe's JSON result."""
+    path = os.pathsep.join(p for p in (_ROOT, os.environ.get('PYTHONPATH')) if p)
+    env = dict(os.environ, PYTHONWARNINGS='ignore', PYTHONPATH=path)
+    result = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)], cwd=cwd, env=env,
+                            capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def check(name, module, budget, forbidden, repeat, cwd):
+    runs = [probe(module, cwd) for _ in range(repeat)]
+    for run in runs:
+        if 'skipped' in run or 'error' in run:
+            return {'status': 'skipped' if 'skipped' in run else 'error', 'detail': run.get('skipped') or run.get('error')}
+    seconds = statistics.median(run['seconds'] for run in runs)
+    loaded = sorted(set(forbidden) & set(runs[0]['modules']))
+    problems = []
+    if seconds > budget:
+        problems.append(f"{name}: cold import {seconds:.3f}s exceeds budget {budget:.3f}s")
+    if loaded:
+        problems.append(f"{name}: import of {module} loaded {', '.join(loaded)}")
+    if runs[0]['created']:
+        problems.append(f"{name}: import of {module} created {', '.join(runs[0]['created'])}")
+    return {'status': 'ok' if not problems else 'failed', 'seconds': seconds, 'budget': budget,
+            'forbidden_loaded': loaded, 'created': runs[0]['created'], 'problems': problems}
+
+def _budget(value):
+    name, _, seconds = value.partition('=')
+    return name, float(seconds)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check cold-import time and lazily loaded dependencies")
+    parser.add_argument('--only', nargs='*', choices=sorted(TARGETS), help="Targets to check (default: all)")
+    parser.add_argument('--max-seconds', nargs='*', type=_budget, default=[], metavar='TARGET=SECONDS',
+                        help="Override a target's budget")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="Write JSON results to this path")
+    args = parser.parse_args(argv)
+
+    budgets = dict(args.max_seconds)
+    # Probe from an empty directory so import-time files (e.g. uploads/) are detected
+    with tempfile.TemporaryDirectory() as cwd:
+        results = {}
+        for name in args.only or TARGETS:
+            module, budget, forbidden = TARGETS[name]
+            results[name] = check(name, module, budgets.get(name, budget), forbidden, args.repeat, cwd)
+            r = results[name]
+            if 'seconds' in r:
+                print(f"{name:<10} {r['seconds']:>8.3f}s (budget {r['budget']:.3f}s) {r['status']}", file=sys.stderr)
+            else:
+                print(f"{name:<10} {r['status']} ({r['detail']})", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    problems = [p for r in results.values() for p in r.get('problems', [])]
+    for message in problems:
+        print(f"BUDGET {message}", file=sys.stderr)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+End-to-end load test for the FastAPI app.
+
+    # start the app in-process on a free port
+    python -m ultimate_excel_ai.benchmarks.loadtest --users 8 --duration 60
+    # or target a running server and sample its worker RSS
+    # (start it with ADMISSION_TRUST_CLIENT_ID=1 so each user gets its own admission budget)
+    python -m ultimate_excel_ai.benchmarks.loadtest --url http://127.0.0.1:8000 --pid 12345
+
+Every virtual user uploads its own copy of a synthetic dataset, calls /analyze,
+then issues requests drawn from --mix until the duration elapses. The report
+has p50/p95/p99 latency, throughput and error rate per endpoint, plus the
+server's RSS sampled over time.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import numpy as np
+import requests
+
+from ultimate_excel_ai.benchmarks import datagen
+
+API_PREFIX = "/api/v1"
+DEFAULT_MIX = "analyze=3,predict=1,forecast=1,anomalies=1"
+
+def _rss_mb(pid):
+    """Resident set size of a process in MB (Linux /proc), or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+class InProcessServer:
+    """Runs the API with uvicorn in a background thread of this process."""
+    def __init__(self, host="127.0.0.1"):
+        import uvicorn
+        from ultimate_excel_ai.config import settings
+        # All virtual users connect from this host; let their X-Client-ID headers tell them apart
+        settings.ADMISSION_TRUST_CLIENT_ID = True
+        with socket.socket() as s:
+            s.bind((host, 0))
+            self.port = s.getsockname()[1]
+        config = uvicorn.Config("ultimate_excel_ai.api.main:app", host=host, port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.url = f"http://{host}:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("API server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []  # (endpoint, started, latency, ok, status)
+
+    def record(self, endpoint, started, latency, ok, status):
+        with self.lock:
+            self.samples.append((endpoint, started, latency, ok, status))
+
+class UserSession:
+    """One scripted user: upload, analyze, then a weighted mix of heavier calls."""
+    def __init__(self, user_id, base_url, payload, mix, recorder, columns, seed):
+        self.http = requests.Session()
+        # Each virtual user is its own tenant for the API's per-client admission limits
+        self.http.headers['X-Client-ID'] = f"loadtest-user{user_id}"
+        self.base = base_url.rstrip("/") + API_PREFIX
+        self.filename = f"loadtest_user{user_id}.csv"
+        self.payload = payload
+        self.endpoints, self.weights = zip(*mix.items())
+        self.recorder = recorder
+        self.columns = columns
+        self.rng = random.Random(seed)
+
+    def _call(self, endpoint, **kwargs):
+        started = time.perf_counter()
+        status = 0
+        try:
+            response = self.http.post(f"{self.base}/{endpoint}", timeout=600, **kwargs)
+            status = response.status_code
+            ok = response.ok
+        except requests.RequestException:
+            ok = False
+        self.recorder.record(endpoint, started, time.perf_counter() - started, ok, status)
+        return ok
+
+    def request(self, endpoint):
+        fname = self.filename
+        if endpoint == "analyze":
+            return self._call("analyze", params={"filename": fname})
+        if endpoint == "predict":
+            return self._call("predict", json={"filename": fname, "target_column": self.columns['target']})
+        if endpoint == "forecast":
+            return self._call("forecast", json={"filename": fname, "date_column": self.columns['date'],
+                                                "target_column": self.columns['value'], "periods": 30})
+        if endpoint == "anomalies":
+            return self._call("anomalies", params={"filename": fname})
+        if endpoint == "rows":
+            return self._call("rows", json={"filename": fname, "limit": 100, "sort": [{"column": self.columns['value'], "descending": True}]})
+        if endpoint == "query":
+            return self._call("query", json={"filename": fname, "query": f"sum of {self.columns['value']} by region"})
+        raise ValueError(f"Unknown endpoint in mix: {endpoint}")
+
+    def run(self, deadline):
+        if not self._call("upload", files={"file": (self.filename, self.payload, "text/csv")}):
+            return
+        self.request("analyze")
+        while time.perf_counter() < deadline:
+            self.request(self.rng.choices(self.endpoints, self.weights)[0])
+
+def sample_rss(pid, stop, interval, started, out):
+    while not stop.is_set():
+        rss = _rss_mb(pid)
+        if rss is not None:
+            out.append((round(time.perf_counter() - started, 2), round(rss, 1)))
+        stop.wait(interval)
+
+def summarize(samples, elapsed):
+    report = {}
+    for endpoint in sorted({s[0] for s in samples}):
+        rows = [s for s in samples if s[0] == endpoint]
+        latencies = np.array([s[2] for s in rows]) * 1000
+        errors = sum(1 for s in rows if not s[3])
+        report[endpoint] = {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': errors / len(rows),
+            'throughput_rps': len(rows) / elapsed if elapsed else 0.0,
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'max_ms': float(latencies.max()),
+            'status_codes': {str(code): sum(1 for s in rows if s[4] == code) for code in sorted({s[4] for s in rows})},
+        }
+    return report
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+def run(base_url, pid, args):
+    df = datagen.make_sales_data(args.rows, seed=args.seed)
+    payload = datagen.to_csv_bytes(df)
+    columns = {'date': 'order_date', 'value': 'sales', 'target': 'profit'}
+    recorder = Recorder()
+    rss = []
+    stop = threading.Event()
+    started = time.perf_counter()
+    sampler = threading.Thread(target=sample_rss, args=(pid, stop, args.sample_interval, started, rss), daemon=True)
+    sampler.start()
+
+    deadline = started + args.duration
+    users = [UserSession(i, base_url, payload, parse_mix(args.mix), recorder, columns, args.seed + i) for i in range(args.users)]
+    threads = []
+    for user in users:
+        thread = threading.Thread(target=user.run, args=(deadline,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp_up / max(args.users, 1))
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+
+    samples = recorder.samples
+    return {
+        'meta': {'url': base_url, 'users': args.users, 'duration_s': args.duration, 'rows': args.rows,
+                 'mix': parse_mix(args.mix), 'elapsed_s': elapsed},
+        'total': {'requests': len(samples), 'errors': sum(1 for s in samples if not s[3]),
+                  'throughput_rps': len(samples) / elapsed if elapsed else 0.0},
+        'endpoints': summarize(samples, elapsed),
+        'rss_mb': rss,
+    }
+
+def print_report(report):
+    print(f"{'endpoint':<12} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=sys.stderr)
+    for name, r in report['endpoints'].items():
+        print(f"{name:<12} {r['requests']:>6} {r['error_rate'] * 100:>5.1f}% {r['throughput_rps']:>7.2f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}", file=sys.stderr)
+    if report['rss_mb']:
+        peak = max(mb for _, mb in report['rss_mb'])
+        print(f"server RSS: start {report['rss_mb'][0][1]:.0f} MB, peak {peak:.0f} MB", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Ultimate Excel AI API")
+    parser.add_argument('--url', help="Base URL of a running server (default: start the app in-process)")
+    parser.add_argument('--pid', type=int, help="Server worker PID for RSS sampling when using --url")
+    parser.add_argument('--users', type=int, default=4, help="Concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run")
+    parser.add_argument('--ramp-up', type=float, default=1, help="Seconds over which users start")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Weighted endpoint mix (default: {DEFAULT_MIX})")
+    parser.add_argument('--rows', type=int, default=5000, help="Rows in each uploaded dataset")
+    parser.add_argument('--sample-interval', type=float, default=0.5, help="RSS sampling interval in seconds")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write JSON report to this path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        report = run(args.url, args.pid, args)
+    else:
+        with InProcessServer() as server:
+            report = run(server.url, os.getpid(), args)
+
+    print_report(report)
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
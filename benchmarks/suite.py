@@ -0,0 +1,274 @@
+"""
+Benchmarks for the logic/ pipeline.
+
+    python -m ultimate_excel_ai.benchmarks.suite --rows 10000 1000000 --output bench.json
+    python -m ultimate_excel_ai.benchmarks.suite --rows 10000 --baseline bench.json
+
+Each benchmark reports the median wall time over --repeat runs and the peak
+traced allocation (tracemalloc) of one extra run. With --baseline, results are
+compared per row count and the process exits with status 1 on a regression.
+"""
+import argparse
+import datetime
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from ultimate_excel_ai.benchmarks import datagen
+
+PRESETS = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+class Skip(Exception):
+    """Raised by a benchmark whose optional dependency is missing."""
+
+def _charts():
+    try:
+        import plotly.express  # noqa: F401  (the chart builders import it on first use)
+        from ultimate_excel_ai.logic import charts
+    except ImportError as e:
+        raise Skip(str(e))
+    return charts
+
+class Context:
+    """Inputs shared by the benchmarks of one scale, prepared outside the timed region."""
+    def __init__(self, rows, extra_numeric, extra_categorical, xlsx_rows, seed):
+        from ultimate_excel_ai.logic import data
+        self.raw = datagen.make_sales_data(rows, extra_numeric, extra_categorical, seed=seed)
+        self.csv = datagen.to_csv_bytes(self.raw)
+        self.xlsx_rows = min(xlsx_rows, rows, datagen.XLSX_MAX_ROWS)
+        self._xlsx = None
+        self.df, self.num, self.cat, self.date, _ = data.process_data(self.raw.copy())
+        self.pivots = None
+
+    @property
+    def xlsx(self):
+        if self._xlsx is None:
+            self._xlsx = datagen.to_xlsx_bytes(self.raw.iloc[:self.xlsx_rows])
+        return self._xlsx
+
+def _load_csv(ctx):
+    from ultimate_excel_ai.logic import data
+    return lambda: data.load_data(io.BytesIO(ctx.csv), 'bench.csv')
+
+def _load_xlsx(ctx):
+    from ultimate_excel_ai.logic import data
+    payload = ctx.xlsx
+    return lambda: data.load_data(io.BytesIO(payload), 'bench.xlsx')
+
+def _load_batch(ctx):
+    from ultimate_excel_ai.logic import data
+    # Four regional CSVs, processed one per worker process
+    parts = 4
+    size = -(-len(ctx.raw) // parts)
+    files = [(f'region{i}.csv', datagen.to_csv_bytes(ctx.raw.iloc[i * size:(i + 1) * size])) for i in range(parts)]
+    return lambda: data.load_batch(files)
+
+def _process(ctx):
+    from ultimate_excel_ai.logic import data
+    return lambda: data.process_data(ctx.raw.copy())
+
+def _insights(ctx):
+    from ultimate_excel_ai.logic import analysis
+    return lambda: analysis.generate_insights(ctx.df, ctx.num, ctx.date)
+
+def _pivots(ctx):
+    from ultimate_excel_ai.logic import pivots
+    return lambda: pivots.generate_pivot_tables(ctx.df, ctx.num, ctx.cat, ctx.date)
+
+def _heatmap(ctx):
+    charts = _charts()
+    return lambda: charts.generate_correlation_heatmap(ctx.df, ctx.num)
+
+def _distribution(ctx):
+    charts = _charts()
+    return lambda: charts.generate_distribution_chart(ctx.df, 'sales')
+
+def _bar(ctx):
+    charts = _charts()
+    return lambda: charts.generate_bar_chart(ctx.df, 'region', 'sales')
+
+def _line(ctx):
+    charts = _charts()
+    return lambda: charts.generate_line_chart(ctx.df, 'order_date', 'sales')
+
+def _scatter(ctx):
+    charts = _charts()
+    return lambda: charts.generate_scatter_chart(ctx.df, 'sales', 'profit', 'region')
+
+def _train_predictor(ctx):
+    from ultimate_excel_ai.logic import ml
+    return lambda: ml.MachineLearningEngine().train_predictor(ctx.df, 'profit')
+
+def _forecast(ctx):
+    from ultimate_excel_ai.logic import ml
+    return lambda: ml.MachineLearningEngine().forecast_series(ctx.df, 'order_date', 'sales', 30)
+
+def _backtest(ctx):
+    from ultimate_excel_ai.logic import ml
+    series = ml.prepare_series(ctx.df, 'order_date', 'sales')
+    return lambda: ml.MachineLearningEngine().backtest_series(ctx.df, 'order_date', 'sales', horizon=7, folds=5, series=series)
+
+def _anomalies(ctx):
+    from ultimate_excel_ai.logic import ml
+    return lambda: ml.MachineLearningEngine().score_anomalies(ctx.df, ctx.num)
+
+def _report_pivots(ctx):
+    from ultimate_excel_ai.logic import pivots
+    if ctx.pivots is None:
+        ctx.pivots = pivots.generate_pivot_tables(ctx.df, ctx.num, ctx.cat, ctx.date)
+    return ctx.pivots
+
+def _excel_report(ctx):
+    from ultimate_excel_ai.logic import export
+    pivot_data = _report_pivots(ctx)
+    return lambda: export.generate_excel_report(ctx.df.iloc[:datagen.XLSX_MAX_ROWS], pivot_data, insights=['benchmark'])
+
+def _markdown_report(ctx):
+    from ultimate_excel_ai.logic import export
+    try:
+        import tabulate  # noqa: F401  (DataFrame.to_markdown dependency)
+    except ImportError as e:
+        raise Skip(str(e))
+    forecast_df = pd.DataFrame({'Date': pd.date_range('2025-01-01', periods=30), 'Forecast': np.arange(30.0)})
+    pivot_data = _report_pivots(ctx)
+    return lambda: export.generate_markdown_report(ctx.df, pivot_data, forecast_df, insights=['benchmark'])
+
+# name -> factory(ctx) returning the zero-argument callable to time
+BENCHMARKS = {
+    'load_data.csv': _load_csv,
+    'load_data.xlsx': _load_xlsx,
+    'load_batch.csv': _load_batch,
+    'process_data': _process,
+    'generate_insights': _insights,
+    'generate_pivot_tables': _pivots,
+    'charts.correlation_heatmap': _heatmap,
+    'charts.distribution': _distribution,
+    'charts.bar': _bar,
+    'charts.line': _line,
+    'charts.scatter': _scatter,
+    'ml.train_predictor': _train_predictor,
+    'ml.forecast_series': _forecast,
+    'ml.backtest_series': _backtest,
+    'ml.detect_anomalies': _anomalies,
+    'export.excel_report': _excel_report,
+    'export.markdown_report': _markdown_report,
+}
+
+def measure(fn, repeat):
+    """Median/min wall time over `repeat` runs, then peak traced memory of one more run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds': statistics.median(times),
+        'min_seconds': min(times),
+        'repeat': repeat,
+        'peak_mb': peak / 2 ** 20,
+    }
+
+def run_scale(rows, args):
+    print(f"\n== {rows:,} rows ==", file=sys.stderr)
+    ctx = Context(rows, args.extra_numeric, args.extra_categorical, args.xlsx_rows, args.seed)
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        try:
+            result = {'status': 'ok', **measure(factory(ctx), args.repeat)}
+            if name == 'load_data.xlsx':
+                result['rows'] = ctx.xlsx_rows
+            print(f"{name:<28} {result['seconds']:>10.4f}s {result['peak_mb']:>10.1f} MB", file=sys.stderr)
+        except Skip as e:
+            result = {'status': 'skipped', 'detail': str(e)}
+            print(f"{name:<28} skipped ({e})", file=sys.stderr)
+        except Exception as e:
+            result = {'status': 'error', 'detail': f"{type(e).__name__}: {e}"}
+            print(f"{name:<28} error ({result['detail']})", file=sys.stderr)
+        results[name] = result
+    return {'rows': rows, 'columns': len(ctx.raw.columns), 'results': results}
+
+def compare(current, baseline, threshold, min_seconds):
+    """Returns a list of regression messages (time or peak memory above threshold)."""
+    regressions = []
+    base_runs = {run['rows']: run['results'] for run in baseline.get('runs', [])}
+    for run in current['runs']:
+        base = base_runs.get(run['rows'])
+        if base is None:
+            continue
+        for name, result in run['results'].items():
+            ref = base.get(name)
+            if not ref or result.get('status') != 'ok' or ref.get('status') != 'ok':
+                continue
+            ratio = result['seconds'] / ref['seconds'] if ref['seconds'] else 1.0
+            mem_ratio = result['peak_mb'] / ref['peak_mb'] if ref['peak_mb'] else 1.0
+            result['vs_baseline'] = {'time_ratio': ratio, 'memory_ratio': mem_ratio}
+            if ratio > 1 + threshold and result['seconds'] - ref['seconds'] > min_seconds:
+                regressions.append(f"{run['rows']:,} rows {name}: {ref['seconds']:.4f}s -> {result['seconds']:.4f}s ({ratio:.2f}x)")
+            if mem_ratio > 1 + threshold and result['peak_mb'] - ref['peak_mb'] > 1:
+                regressions.append(f"{run['rows']:,} rows {name}: {ref['peak_mb']:.1f} MB -> {result['peak_mb']:.1f} MB peak ({mem_ratio:.2f}x)")
+    return regressions
+
+def _rows(value):
+    return PRESETS[value.lower()] if value.lower() in PRESETS else int(value.replace('_', ''))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the logic/ pipeline")
+    parser.add_argument('--rows', nargs='+', type=_rows, default=[10_000], help="Row counts or presets (10k, 1m, 10m)")
+    parser.add_argument('--extra-numeric', type=int, default=0, help="Additional numeric columns")
+    parser.add_argument('--extra-categorical', type=int, default=0, help="Additional categorical columns")
+    parser.add_argument('--xlsx-rows', type=int, default=100_000, help="Row cap for the xlsx load benchmark")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='*', help="Run benchmarks whose name contains any of these strings")
+    parser.add_argument('--output', help="Write JSON results to this path (default: stdout)")
+    parser.add_argument('--baseline', help="Compare against a previous JSON result")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown / memory growth (0.2 = 20%%)")
+    parser.add_argument('--min-seconds', type=float, default=0.01, help="Ignore time regressions smaller than this")
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'runs': [run_scale(rows, args) for rows in args.rows],
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold, args.min_seconds)
+        report['regressions'] = regressions
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    for message in regressions:
+        print(f"REGRESSION {message}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
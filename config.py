@@ -12,6 +12,26 @@ class Settings:
     MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024  # 50 MB
     UPLOAD_DIR: str = os.path.join(os.getcwd(), "uploads")
     
+    # API Responses
+    MAX_PAGE_SIZE: int = 10000
+    
+    # Instrumentation
+    TRACK_ALLOCATIONS: bool = os.getenv("TRACK_ALLOCATIONS", "0") == "1"  # tracemalloc peaks per stage (slow)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "0") == "1"  # honour X-Profile: 1 request header
+    PROFILE_DIR: str = os.path.join(os.getcwd(), "profiles")
+    
+    # Admission control for heavy jobs (upload, predict, forecast, ...)
+    ADMISSION_MAX_CONCURRENT: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", max(1, (os.cpu_count() or 2) // 2)))
+    ADMISSION_MAX_MEMORY_MB: int = int(os.getenv("ADMISSION_MAX_MEMORY_MB", 2048))
+    ADMISSION_CLIENT_CONCURRENT: int = int(os.getenv("ADMISSION_CLIENT_CONCURRENT", 2))  # running + queued
+    ADMISSION_CLIENT_MEMORY_MB: int = int(os.getenv("ADMISSION_CLIENT_MEMORY_MB", 1024))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", 32))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 30))  # seconds
+    # Clients are keyed on the peer address; X-Client-ID is a client-supplied header, so it is
+    # only honoured when enabled here or when it arrives through one of the trusted proxies
+    ADMISSION_TRUST_CLIENT_ID: bool = os.getenv("ADMISSION_TRUST_CLIENT_ID", "0") == "1"
+    TRUSTED_PROXIES: list = [h.strip() for h in os.getenv("TRUSTED_PROXIES", "").split(",") if h.strip()]
+    
     # ML Settings
     MODEL_TIMEOUT: int = 300 # seconds
     
@@ -20,5 +40,8 @@ class Settings:
 
 settings = Settings()
 
-# Ensure upload directory exists
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+def ensure_upload_dir():
+    """Creates the upload directory on first use; importing config has no filesystem side effects."""
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    return settings.UPLOAD_DIR
+
@@ -0,0 +1,40 @@
+import importlib
+import threading
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+    Safe to share between request threads: the import runs once, under a lock.
+    """
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self.__dict__['_module'] = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def module(name):
+    """Returns a LazyModule for `name`, e.g. `ml = lazy.module("ultimate_excel_ai.logic.ml")`."""
+    return LazyModule(name)
@@ -1,13 +1,19 @@
 import pandas as pd
 import numpy as np
+from ultimate_excel_ai.logic import telemetry
 
 def get_summary_statistics(df, numeric_cols):
     """Returns dataframe describe()"""
     if not numeric_cols: return pd.DataFrame()
     return df[numeric_cols].describe()
 
-def generate_insights(df, numeric_cols, date_cols):
-    """Generates textual insights."""
+@telemetry.instrument('analysis.generate_insights')
+def generate_insights(df, numeric_cols, date_cols, approximate=False, sample_rows=100_000):
+    """
+    Generates textual insights.
+    approximate=True computes correlations on a uniform row sample of at most
+    `sample_rows` and finds the trend endpoints without sorting the dataset.
+    """
     insights = []
     insights.append(f"Dataset Shape: {len(df)} rows, {len(df.columns)} columns.")
     
@@ -18,11 +24,17 @@ def generate_insights(df, numeric_cols, date_cols):
         insights.append("Data quality: Clean (no missing values).")
 
     if len(numeric_cols) > 1:
-        corr_matrix = df[numeric_cols].corr().abs()
+        numeric = df[numeric_cols]
+        sampled = approximate and len(df) > sample_rows
+        if sampled:
+            numeric = numeric.sample(n=sample_rows, random_state=42)
+        corr_matrix = numeric.corr().abs()
         upper = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
         to_drop = [column for column in upper.columns if any(upper[column] > 0.8)]
         if to_drop:
-            insights.append(f"High correlations: {', '.join(to_drop[:3])} are strongly correlated with other variables.")
+            # Standard error of a sample correlation is about 1/sqrt(n)
+            note = f" (approximate, ±{2 / np.sqrt(sample_rows):.3f})" if sampled else ""
+            insights.append(f"High correlations: {', '.join(to_drop[:3])} are strongly correlated with other variables{note}.")
 
     if 'Is_Anomaly' in df.columns:
         n_anomalies = df['Is_Anomaly'].sum()
@@ -31,10 +43,16 @@ def generate_insights(df, numeric_cols, date_cols):
 
     if date_cols and numeric_cols:
         target = numeric_cols[0]
-        # sort by date to get trend
-        sorted_df = df.sort_values(date_cols[0])
-        first_val = sorted_df[target].iloc[0]
-        last_val = sorted_df[target].iloc[-1]
+        if approximate:
+            # Earliest / latest rows in one pass instead of a full sort
+            dates = df[date_cols[0]]
+            first_val = df[target].iloc[dates.argmin()]
+            last_val = df[target].iloc[dates.argmax()]
+        else:
+            # sort by date to get trend
+            sorted_df = df.sort_values(date_cols[0])
+            first_val = sorted_df[target].iloc[0]
+            last_val = sorted_df[target].iloc[-1]
         
         # Avoid division by zero
         if first_val != 0:
@@ -1,5 +1,6 @@
-import plotly.express as px
-import plotly.graph_objects as go
+from ultimate_excel_ai.logic import telemetry
+
+# plotly is imported inside the builders so importing this module stays cheap
 
 # Professional Color Palette
 PRIMARY_COLOR = "#007BFF"
@@ -22,35 +23,45 @@ def update_layout(fig, title):
     )
     return fig
 
+@telemetry.instrument('charts.correlation_heatmap')
 def generate_correlation_heatmap(df, numeric_cols):
     """Generates a correlation heatmap."""
+    import plotly.express as px
     if len(numeric_cols) < 2: return None
     corr = df[numeric_cols].corr()
     fig = px.imshow(corr, text_auto=".2f", aspect="auto", color_continuous_scale='RdBu_r')
     return update_layout(fig, "Correlation Heatmap")
 
+@telemetry.instrument('charts.distribution')
 def generate_distribution_chart(df, col):
     """Generates a histogram."""
+    import plotly.express as px
     fig = px.histogram(df, x=col, nbins=30, color_discrete_sequence=[PRIMARY_COLOR])
     fig.update_traces(marker_line_width=0, opacity=0.8)
     return update_layout(fig, f"Distribution of {col}")
 
+@telemetry.instrument('charts.bar')
 def generate_bar_chart(df, cat_col, num_col):
     """Generates a bar chart."""
+    import plotly.express as px
     data = df.groupby(cat_col)[num_col].sum().reset_index().sort_values(num_col, ascending=False).head(15)
     fig = px.bar(data, x=cat_col, y=num_col, color_discrete_sequence=[PRIMARY_COLOR])
     fig.update_traces(marker_line_width=0, opacity=0.9)
     return update_layout(fig, f"Top {num_col} by {cat_col}")
 
+@telemetry.instrument('charts.line')
 def generate_line_chart(df, date_col, num_col):
     """Generates a line chart for time series."""
+    import plotly.express as px
     data = df.groupby(date_col)[num_col].sum().reset_index().sort_values(date_col)
     fig = px.line(data, x=date_col, y=num_col, markers=True)
     fig.update_traces(line_color=PRIMARY_COLOR, line_width=2, marker_size=6)
     return update_layout(fig, f"{num_col} Trend over {date_col}")
 
+@telemetry.instrument('charts.scatter')
 def generate_scatter_chart(df, num_col_x, num_col_y, color_col=None):
     """Generates a scatter plot."""
+    import plotly.express as px
     fig = px.scatter(df, x=num_col_x, y=num_col_y, color=color_col, color_discrete_sequence=px.colors.qualitative.Prism)
     fig.update_traces(marker=dict(size=8, opacity=0.7, line=dict(width=1, color='DarkSlateGrey')))
     return update_layout(fig, f"{num_col_y} vs {num_col_x}")
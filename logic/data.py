@@ -2,11 +2,18 @@ import pandas as pd
 import numpy as np
 import os
 import io
+import zipfile
+from ultimate_excel_ai.logic import sketches, dedup, telemetry, parallel
 
-def load_data(file_content, filename):
+SUPPORTED_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+# Smaller batches are parsed serially: worker start-up and pickling would cost more than they save
+BATCH_PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+def load_data(file_content, filename, sheet_name=0):
     """
     Loads data from bytes or file-like object.
     Returns a pandas DataFrame and a status message.
+    sheet_name selects the Excel sheet (name or position); ignored for CSV.
     """
     try:
         file_ext = os.path.splitext(filename)[1].lower()
@@ -14,7 +21,7 @@ def load_data(file_content, filename):
         if file_ext == '.csv':
             df = pd.read_csv(file_content)
         elif file_ext in ['.xls', '.xlsx']:
-            df = pd.read_excel(file_content)
+            df = pd.read_excel(file_content, sheet_name=sheet_name)
         else:
             return None, "Unsupported file format. Please upload .csv or .xlsx."
             
@@ -45,40 +52,262 @@ def detect_column_types(df):
     date_cols = df.select_dtypes(include=['datetime']).columns.tolist()
     return numeric_cols, categorical_cols, date_cols
 
-def clean_missing_values(df, numeric_cols, categorical_cols):
-    """Imputes missing values."""
+def clean_missing_values(df, numeric_cols, categorical_cols, sketch=None):
+    """
+    Imputes missing values.
+    With a DatasetSketch, medians and modes come from the sketch instead of
+    exact full-column passes.
+    """
     for col in numeric_cols:
         if df[col].isnull().any():
-            df[col].fillna(df[col].median(), inplace=True)
+            fill = sketch.median(col).value if sketch is not None else df[col].median()
+            df[col] = df[col].fillna(fill)
             
     for col in categorical_cols:
         if df[col].isnull().any():
-            if not df[col].mode().empty:
-                df[col].fillna(df[col].mode()[0], inplace=True)
+            if sketch is not None:
+                fill = sketch.mode(col)[0]
             else:
-                df[col].fillna("Unknown", inplace=True)
+                mode = df[col].mode()
+                fill = mode[0] if not mode.empty else None
+            df[col] = df[col].fillna(fill if fill is not None else "Unknown")
     return df
 
-def remove_duplicates(df):
-    """Removes duplicate rows."""
-    initial_rows = len(df)
-    df = df.drop_duplicates()
-    duplicates_removed = initial_rows - len(df)
-    return df, duplicates_removed
+def imputation_bounds(sketch, columns):
+    """Approximate fill value per column with error bounds (median value range / mode count range)."""
+    bounds = {}
+    for col in columns:
+        if sketch.columns[col].numeric:
+            est = sketch.median(col)
+            bounds[col] = {'value': est.value, 'lower': est.lower, 'upper': est.upper}
+        else:
+            item, est = sketch.mode(col)
+            bounds[col] = {'value': None if item is None else str(item), 'count_lower': est.lower, 'count_upper': est.upper}
+    return bounds
+
+def imputation_sketch():
+    """Empty DatasetSketch for process_data(approximate=True): medians and modes only."""
+    return sketches.DatasetSketch(distinct=False)
 
-def process_data(df):
+def update_sketch(sketch, df, numeric_cols, categorical_cols, needed, earlier=None):
+    """
+    Brings `sketch`, a DatasetSketch of the dataset's earlier rows, up to date with
+    the rows of df. Columns it already tracks take the new rows; columns in `needed`
+    it does not track yet are sketched over `earlier` (the earlier rows) and df.
+    A column is only sketched once it needs imputing, so until then its earlier
+    values are unmodified and can be sketched exactly.
+    """
+    numeric = set(numeric_cols)
+    # Columns whose type changed restart from the new rows
+    retyped = {c for c, col in sketch.columns.items() if c in df.columns and col.numeric != (c in numeric)}
+    for col in retyped:
+        del sketch.columns[col]
+    sketch.update(df)
+    fresh = [c for c in needed if c not in sketch.columns]
+    frames = [df] if earlier is None else [earlier, df]
+    for cols, source in (([c for c in fresh if c not in retyped], frames), ([c for c in fresh if c in retyped], [df])):
+        sketch.add_columns([c for c in cols if c in numeric], [c for c in cols if c not in numeric], source)
+    return sketch
+
+def remove_duplicates(df, subset=None, verify=True, history=None):
+    """
+    Removes duplicate rows (by `subset` columns if given) using chunked row hashes.
+    Rows whose hash is already in `history` (a dedup.RowHashIndex) are removed too,
+    and the hashes of the kept rows are added to it.
+    """
+    report = dedup.find_duplicates(df, subset=subset, verify=verify, history=history)
+    if history is not None:
+        if history.columns is None:
+            history.columns = list(subset) if subset else list(df.columns)
+        history.add(report.hashes[report.keep])
+    return df[report.keep], report.count
+
+@telemetry.instrument('process_data')
+def process_data(df, approximate=False, history=None, sketch=None, earlier=None, impute=True):
     """
     Main processing pipeline.
     Returns cleaned dataframe, column types, and cleaning stats.
+    approximate=True imputes from single-pass sketches (see logic.sketches) and
+    reports the imputed values with their error bounds in stats['imputed'].
+    history: optional dedup.RowHashIndex of earlier rows of the same dataset; rows
+    already seen are dropped and the index is updated with the new ones.
+    sketch: with approximate=True, a DatasetSketch to keep (see imputation_sketch);
+    for appends the dataset's sketch, merged with the new rows in place, and
+    `earlier` its current rows (used for columns imputed for the first time).
+    impute=False stops after dedup, leaving missing values for impute_missing.
     """
     stats = {}
-    df = clean_column_names(df)
-    numeric_cols, categorical_cols, date_cols = detect_column_types(df)
-    df, dups = remove_duplicates(df)
-    stats['duplicates_removed'] = dups
+    with telemetry.timed('process_data.clean_column_names'):
+        df = clean_column_names(df)
+    with telemetry.timed('process_data.detect_column_types'):
+        numeric_cols, categorical_cols, date_cols = detect_column_types(df)
+    with telemetry.timed('process_data.remove_duplicates'):
+        df, dups = remove_duplicates(df, history=history)
+    stats['duplicates_removed'] = int(dups)
+    if impute:
+        df = impute_missing(df, numeric_cols, categorical_cols, stats, approximate, sketch, earlier)
+    return df, numeric_cols, categorical_cols, date_cols, stats
+
+def impute_missing(df, numeric_cols, categorical_cols, stats, approximate=False, sketch=None, earlier=None):
+    """
+    Imputation step of process_data (same arguments); records missing_filled, and
+    for approximate=True the imputed values' bounds, in `stats`.
+    """
+    missing = df.isnull().sum()
+    missing_before = missing.sum()
+    if approximate:
+        # Only columns that need imputing are sketched
+        needed = [c for c in numeric_cols + categorical_cols if missing[c] > 0]
+        with telemetry.timed('process_data.build_sketch'):
+            sketch = update_sketch(sketch if sketch is not None else imputation_sketch(),
+                                   df, numeric_cols, categorical_cols, needed, earlier)
+        stats['approximate'] = True
+        stats['imputed'] = imputation_bounds(sketch, needed)
+    else:
+        sketch = None
+    with telemetry.timed('process_data.clean_missing_values'):
+        df = clean_missing_values(df, numeric_cols, categorical_cols, sketch)
+    stats['missing_filled'] = int(missing_before - df.isnull().sum().sum())
+    return df
+
+def expand_batch(files, all_sheets=False):
+    """
+    Splits a batch of (filename, bytes) into parts: zip archives contribute their
+    .csv/.xlsx members and, with all_sheets=True, workbooks contribute every sheet.
+    Returns a list of (part_name, filename, content, sheet_name).
+    """
+    parts = []
+    for filename, content in files:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext == '.zip':
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                members = [m for m in archive.infolist()
+                           if not m.is_dir() and not m.filename.startswith('__MACOSX/')
+                           and os.path.splitext(m.filename)[1].lower() in SUPPORTED_EXTENSIONS]
+                expanded = expand_batch([(m.filename, archive.read(m)) for m in members], all_sheets)
+            parts.extend((f"{filename}/{name}", member, data, sheet) for name, member, data, sheet in expanded)
+        elif all_sheets and ext in ('.xls', '.xlsx'):
+            with pd.ExcelFile(io.BytesIO(content)) as workbook:
+                sheets = workbook.sheet_names
+            parts.extend((f"{filename}:{sheet}", filename, content, sheet) for sheet in sheets)
+        else:
+            parts.append((filename, filename, content, 0))
+    return parts
+
+def _ingest_part(name, filename, content, sheet_name, approximate, impute):
+    """load_data + process_data for one batch part (runs in a worker process)."""
+    df, msg = load_data(io.BytesIO(content), filename, sheet_name)
+    if df is None:
+        return {'name': name, 'error': msg}
+    row_index = dedup.RowHashIndex()
+    sketch = imputation_sketch() if approximate else None
+    df, num, cat, date, stats = process_data(df, approximate=approximate, history=row_index, sketch=sketch,
+                                                 impute=impute)
+    return {'name': name, 'df': df, 'num': num, 'cat': cat, 'date': date, 'stats': stats, 'row_index': row_index,
+            'sketch': sketch}
+
+def load_batch(files, approximate=False, all_sheets=False, max_workers=None, impute=True):
+    """
+    Loads and processes several files, the members of zip archives or the sheets
+    of workbooks, one part per worker process once the parts add up to
+    BATCH_PARALLEL_MIN_BYTES (serially below that).
+    Returns one dict per part in input order: name, df, num, cat, date, stats,
+    row_index and sketch (None unless approximate), or name and error if the part
+    could not be loaded.
+    impute=False leaves the parts' missing values for combine_parts.
+    """
+    parts = expand_batch(files, all_sheets)
+    size = sum(len(content) for _, _, content, _ in parts)
+    workers = parallel.worker_count(len(parts), max_workers) if size >= BATCH_PARALLEL_MIN_BYTES else 1
+    with telemetry.timed('load_batch'):
+        return parallel.run_tasks(_ingest_part, [(*part, approximate, impute) for part in parts], workers)
+
+def combine_parts(parts, join='outer', source_column=None, history=None, sketch=None):
+    """
+    Concatenates batch parts, loaded with load_batch(impute=False), into one dataset.
+    join='outer' keeps the union of columns, 'inner' only the columns every part has;
+    rows of parts without a column are left missing there and counted per column in
+    stats['alignment_gaps'] (apart from stats['missing_filled'], the values imputed
+    inside parts). Duplicates across parts are removed on the rows as loaded (and
+    added to `history`, a dedup.RowHashIndex, if given), the same rows /append would
+    match; then every part's remaining rows are imputed from that part's own values.
+    Column types are re-detected on the combined frame; columns typed differently
+    across parts are listed in stats['type_conflicts'].
+    source_column: optional name of a column recording each row's part (the first
+    part holding it, for rows duplicated across parts); not used for dedup.
+    sketch: for approximate parts, a DatasetSketch that receives the merged part sketches.
+    Returns the same tuple as process_data.
+    """
+    loaded = [p for p in parts if 'df' in p]
+    if not loaded:
+        raise ValueError("None of the batch parts could be loaded")
+    df = pd.concat([p['df'] for p in loaded], join=join, ignore_index=True, sort=False)
+    if source_column and source_column in df.columns:
+        raise ValueError(f"Source column '{source_column}' is already a column of the data")
+    columns = df.columns
+    
+    kinds = {}
+    for p in loaded:
+        for kind in ('num', 'cat', 'date'):
+            for col in p[kind]:
+                kinds.setdefault(col, set()).add(kind)
+    stats = {
+        'parts': len(loaded),
+        'failed_parts': len(parts) - len(loaded),
+        'duplicates_removed': sum(p['stats']['duplicates_removed'] for p in loaded),
+        'type_conflicts': sorted(col for col, k in kinds.items() if len(k) > 1 and col in columns),
+    }
     
-    missing_before = df.isnull().sum().sum()
-    df = clean_missing_values(df, numeric_cols, categorical_cols)
-    stats['missing_filled'] = missing_before - df.isnull().sum().sum()
+    df, dups = remove_duplicates(df, history=history)
+    stats['duplicates_removed'] += int(dups)
+    stats['cross_part_duplicates_removed'] = int(dups)
+    kept = df.index.to_numpy()
+    del df
     
+    bounds = np.cumsum([0] + [len(p['df']) for p in loaded])
+    pieces = []
+    for p, start, stop in zip(loaded, bounds[:-1], bounds[1:]):
+        rows = p['df'].iloc[kept[(kept >= start) & (kept < stop)] - start]
+        rows = rows[[c for c in rows.columns if c in columns]]
+        pieces.append({'name': p['name'], 'df': impute_missing(rows, [c for c in p['num'] if c in columns],
+                                                               [c for c in p['cat'] if c in columns], p['stats'],
+                                                               p.get('sketch') is not None, p.get('sketch')),
+                       'sketch': p.get('sketch')})
+    stats['missing_filled'] = sum(p['stats'].get('missing_filled', 0) for p in loaded)
+    df = pd.concat([p['df'] for p in pieces], join=join, ignore_index=True, sort=False)
+    # Gaps left by the outer join are not imputed: a part without a column says nothing about it
+    gaps = {col: sum(len(p['df']) for p in pieces if col not in p['df'].columns) for col in df.columns}
+    stats['alignment_gaps'] = {col: n for col, n in gaps.items() if n}
+    numeric_cols, categorical_cols, date_cols = detect_column_types(df)
+    if source_column:
+        # Added after dedup so the part name is not part of the row hashes (or of history's columns)
+        names = np.repeat([p['name'] for p in pieces], [len(p['df']) for p in pieces]).astype(object)
+        df[source_column] = names
+        categorical_cols = categorical_cols + [source_column]
+    if sketch is not None:
+        merge_part_sketches(sketch, pieces, df.columns, numeric_cols)
+        stats['approximate'] = True
     return df, numeric_cols, categorical_cols, date_cols, stats
+
+def merge_part_sketches(sketch, parts, columns, numeric_cols):
+    """
+    Fills `sketch` with the parts' column sketches merged, for every column in
+    `columns` (the combined frame's) a part sketched. Parts that did not sketch a
+    column (so never imputed it) or sketched it as another type contribute a sketch
+    of their rows.
+    """
+    numeric = set(numeric_cols)
+    sketched = [c for p in parts if p.get('sketch') is not None for c in p['sketch'].columns]
+    for col in dict.fromkeys(c for c in sketched if c in columns):
+        merged = sketches.ColumnSketch(col in numeric, **sketch.options)
+        for p in parts:
+            if col not in p['df'].columns:
+                continue
+            own = p['sketch'].columns.get(col) if p.get('sketch') is not None else None
+            if own is None or own.numeric != merged.numeric:
+                own = sketches.ColumnSketch(merged.numeric, **sketch.options)
+                own.update(p['df'][col])
+            merged.merge(own)
+        sketch.columns[col] = merged
+    sketch.rows += sum(len(p['df']) for p in parts)
+    return sketch
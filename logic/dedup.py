@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from ultimate_excel_ai.logic.sketches import hash_values
+
+CHUNK_ROWS = 250_000
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def row_hashes(df, subset=None, chunk_rows=CHUNK_ROWS):
+    """
+    64-bit hash per row over `subset` columns (all columns by default), computed in chunks.
+    Numerics hash by value, so int and float versions of a column agree across files.
+    """
+    cols = list(subset) if subset else list(df.columns)
+    missing = [c for c in cols if c not in df.columns]
+    if missing:
+        raise KeyError(f"Unknown columns: {', '.join(map(str, missing))}")
+    out = np.empty(len(df), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            h = np.zeros(len(chunk), dtype=np.uint64)
+            for col in cols:
+                h = h * _MIX + hash_values(chunk[col].to_numpy())
+            out[start:start + len(chunk)] = h
+    return out
+
+class RowHashIndex:
+    """
+    Sorted set of row hashes for one dataset, so later appends can be
+    deduplicated without rescanning the original rows. Persisted with numpy.
+    """
+    def __init__(self, hashes=None, columns=None):
+        self.columns = list(columns) if columns is not None else None
+        self.hashes = np.unique(np.asarray(hashes, dtype=np.uint64)) if hashes is not None else np.empty(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def contains(self, hashes):
+        if not len(self.hashes):
+            return np.zeros(len(hashes), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        return self.hashes[pos] == hashes
+
+    def add(self, hashes):
+        self.hashes = np.union1d(self.hashes, np.asarray(hashes, dtype=np.uint64))
+
+    def save(self, path):
+        np.savez(path, hashes=self.hashes, columns=np.array(self.columns or [], dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f['hashes'], [str(c) for c in f['columns']] or None)
+
+class DuplicateReport:
+    """
+    Result of find_duplicates. Rows sharing a group id are duplicates of each other;
+    `keep` marks the first row of every group (and drops rows already in history).
+    """
+    def __init__(self, hashes, group_ids, keep):
+        self.hashes = hashes
+        self.group_ids = group_ids
+        self.keep = keep
+        counts = np.bincount(group_ids)
+        in_group = np.flatnonzero(counts[group_ids] > 1)
+        self._grouped = in_group[np.argsort(group_ids[in_group], kind='stable')]
+        self._bounds = np.flatnonzero(np.r_[True, np.diff(group_ids[self._grouped]) != 0, True]) if len(in_group) else np.zeros(1, dtype=np.intp)
+
+    @property
+    def count(self):
+        """Rows that would be removed."""
+        return int(len(self.keep) - self.keep.sum())
+
+    @property
+    def group_count(self):
+        return len(self._bounds) - 1
+
+    def groups(self, limit=None):
+        """Row positions per duplicate group (ascending; the first one is kept)."""
+        n = self.group_count if limit is None else min(limit, self.group_count)
+        return [self._grouped[self._bounds[i]:self._bounds[i + 1]] for i in range(n)]
+
+def _split_collisions(df, cols, order, run_ids, run_first, group_ids):
+    """Exact check of hash groups: splits groups whose rows differ (64-bit collisions)."""
+    sorted_runs = run_ids[order]
+    firsts = order[run_first[sorted_runs]]
+    candidates = order != firsts
+    rows, reps = order[candidates], firsts[candidates]
+    if not len(rows):
+        return group_ids
+    equal = np.ones(len(rows), dtype=bool)
+    for col in cols:
+        a = df[col].iloc[rows].reset_index(drop=True)
+        b = df[col].iloc[reps].reset_index(drop=True)
+        equal &= ((a == b) | (a.isna() & b.isna())).to_numpy(dtype=bool, na_value=False)
+    next_id = int(group_ids.max()) + 1
+    for run in np.unique(sorted_runs[candidates][~equal]):
+        members = order[sorted_runs == run]
+        exact = df.iloc[members][cols].groupby(cols, dropna=False, sort=False).ngroup().to_numpy()
+        group_ids[members] = next_id + exact
+        next_id += int(exact.max()) + 1
+    return group_ids
+
+def find_duplicates(df, subset=None, verify=False, history=None, chunk_rows=CHUNK_ROWS):
+    """
+    Hash-based duplicate detection over `subset` columns (all by default).
+    verify=True compares the actual values of rows that share a hash.
+    history: RowHashIndex of earlier data; rows found there are marked for removal too
+    (matched by hash only, since the earlier rows are not available).
+    """
+    cols = list(subset) if subset else (history.columns if history is not None and history.columns else list(df.columns))
+    hashes = row_hashes(df, cols, chunk_rows)
+    order = np.argsort(hashes, kind='stable')
+    sorted_hashes = hashes[order]
+    first = np.r_[True, sorted_hashes[1:] != sorted_hashes[:-1]] if len(df) else np.empty(0, dtype=bool)
+    run_ids = np.empty(len(df), dtype=np.int64)
+    run_ids[order] = np.cumsum(first) - 1
+    group_ids = run_ids.copy()
+    if verify:
+        group_ids = _split_collisions(df, cols, order, run_ids, np.flatnonzero(first), group_ids)
+
+    keep = ~pd.Series(group_ids).duplicated().to_numpy()
+    if history is not None:
+        keep &= ~history.contains(hashes)
+    return DuplicateReport(hashes, group_ids, keep)
@@ -0,0 +1,82 @@
+import pandas as pd
+import numpy as np
+
+class DerivedColumns:
+    """
+    Analysis results for one version of a dataset, kept next to it instead of in
+    modified copies of it. Per-row results (anomaly flags and scores, predictions,
+    residuals) are 1-D arrays aligned with the base frame's rows, a few bytes per
+    row; results that are not per row (forecasts) are stored as small tables.
+    view() joins derived columns onto base rows only when a consumer asks.
+    """
+    def __init__(self, base, version=None):
+        self.base = base
+        self.version = version
+        self._columns = {}
+        self._positions = {}
+        self._tables = {}
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def names(self):
+        return list(self._columns)
+
+    def set(self, name, values):
+        """Stores a per-row result. `values` is a numpy array or pandas Categorical of len(base)."""
+        if name in self.base.columns:
+            raise ValueError(f"Derived column '{name}' clashes with a dataset column")
+        if not isinstance(values, pd.Categorical):
+            values = np.asarray(values)
+        if values.ndim != 1 or len(values) != len(self.base):
+            raise ValueError(f"Derived column '{name}' has {len(values)} values for {len(self.base)} rows")
+        self._columns[name] = values
+        self._positions.pop(name, None)
+
+    def get(self, name):
+        if name not in self._columns:
+            raise KeyError(f"Unknown derived column: {name}")
+        return self._columns[name]
+
+    def positions(self, name):
+        """Row positions where `name` is True (boolean columns) or not null (others); cached."""
+        if name not in self._positions:
+            values = self.get(name)
+            mask = values if values.dtype == bool else ~pd.isna(values)
+            self._positions[name] = np.flatnonzero(mask)
+        return self._positions[name]
+
+    def set_table(self, key, frame):
+        self._tables[key] = frame
+
+    def table(self, key, default=None):
+        return self._tables.get(key, default)
+
+    def has_table(self, key):
+        return key in self._tables
+
+    @property
+    def nbytes(self):
+        columns = sum(int(v.nbytes) for v in self._columns.values())
+        tables = sum(int(t.memory_usage(index=True).sum()) for t in self._tables.values() if t is not None)
+        return columns + tables
+
+    def view(self, rows=None, columns=None, derived=None):
+        """
+        Base rows at positions `rows` (None = all) restricted to `columns`, with the
+        derived columns `derived` (None = all stored) appended. Only the selected
+        rows are materialized; the base frame and stored arrays are not modified.
+        """
+        if columns is not None:
+            missing = [c for c in columns if c not in self.base.columns]
+            if missing:
+                raise KeyError(f"Unknown fields: {', '.join(missing)}")
+        frame = self.base if columns is None else self.base[list(columns)]
+        if rows is not None:
+            frame = frame.iloc[rows]
+        else:
+            frame = frame.copy(deep=False)
+        for name in self.names() if derived is None else derived:
+            values = self.get(name)
+            frame[name] = values if rows is None else values[rows]
+        return frame
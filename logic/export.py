@@ -1,8 +1,14 @@
 import pandas as pd
 import io
+from ultimate_excel_ai.logic import telemetry
 
-def generate_excel_report(df, pivots, forecast_df=None, anomaly_df=None, model_metrics=None, insights=None):
-    """Generates multi-sheet Excel report."""
+@telemetry.instrument('export.excel_report')
+def generate_excel_report(df, pivots, forecast_df=None, anomaly_df=None, model_metrics=None, insights=None, derived=None):
+    """
+    Generates multi-sheet Excel report.
+    derived: DerivedColumns of df; anomalies and held-out predictions are read from it
+    (anomaly_df, a copy of df with an Is_Anomaly column, is still accepted).
+    """
     buffer = io.BytesIO()
     with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
         df.to_excel(writer, sheet_name='Cleaned Data', index=False)
@@ -18,14 +24,25 @@ def generate_excel_report(df, pivots, forecast_df=None, anomaly_df=None, model_m
             pd.DataFrame(summary_data).to_excel(writer, sheet_name='Summary', index=False, header=False)
 
         if forecast_df is not None: forecast_df.to_excel(writer, sheet_name='Forecasts', index=False)
-        if anomaly_df is not None: 
+        if derived is not None and 'Is_Anomaly' in derived:
+            anoms = derived.view(derived.positions('Is_Anomaly'), derived=['Anomaly_Score'])
+            if not anoms.empty: anoms.to_excel(writer, sheet_name='Anomalies', index=False)
+        elif anomaly_df is not None: 
             anoms = anomaly_df[anomaly_df['Is_Anomaly'] == True]
             if not anoms.empty: anoms.to_excel(writer, sheet_name='Anomalies', index=False)
+        if derived is not None:
+            for name in derived.names():
+                if not name.endswith('_Prediction'): continue
+                residual = name[:-len('_Prediction')] + '_Residual'
+                columns = [name] + ([residual] if residual in derived else [])
+                preds = derived.view(derived.positions(name), derived=columns)
+                if not preds.empty: preds.to_excel(writer, sheet_name=f"Predictions {name[:-len('_Prediction')]}"[:31], index=False)
         if pivots:
             for name, pivot in pivots.items():
                 pivot.to_excel(writer, sheet_name=name[:31].replace(':','').replace('/','_'))
     return buffer.getvalue()
 
+@telemetry.instrument('export.markdown_report')
 def generate_markdown_report(df, pivots, forecast_df=None, anomaly_df=None, model_metrics=None, insights=None):
     """Generates Markdown report."""
     md = "# Analysis Report\n\n"
@@ -0,0 +1,210 @@
+import pandas as pd
+import numpy as np
+from collections import OrderedDict
+from ultimate_excel_ai.logic import telemetry
+
+FILTER_OPS = ('eq', 'in', 'range', 'contains')
+
+def _index_dtype(n):
+    """Smallest integer dtype able to hold row positions for n rows."""
+    return np.int32 if n < np.iinfo(np.int32).max else np.int64
+
+class ColumnIndex:
+    """
+    Lazily built index over one column.
+    Numeric, boolean and date columns keep an argsort permutation over their values;
+    categoricals are factorized into sorted codes with code -> rows buckets.
+    In both cases nulls sort last.
+    """
+    def __init__(self, series):
+        self.n = len(series)
+        idx_dtype = _index_dtype(self.n)
+        nulls = series.isna().to_numpy()
+        self.n_valid = int(self.n - nulls.sum())
+
+        if pd.api.types.is_datetime64_any_dtype(series):
+            self.kind = 'date'
+            keys = series.to_numpy(dtype='datetime64[ns]')
+        elif pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            self.kind = 'numeric'
+            keys = series.to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            self.kind = 'categorical'
+            try:
+                codes, self.uniques = pd.factorize(series, sort=True)
+            except TypeError:
+                # Mixed-type object column: order by string form
+                codes, self.uniques = pd.factorize(series.where(series.isna(), series.astype(str)), sort=True)
+            keys = np.where(codes < 0, len(self.uniques), codes)
+
+        # Nulls (NaN / NaT / code k) sort to the end with a stable sort
+        self.order = np.argsort(keys, kind='stable').astype(idx_dtype)
+        self.sorted_keys = keys[self.order]
+        if self.kind == 'categorical':
+            self.bounds = np.searchsorted(self.sorted_keys, np.arange(len(self.uniques) + 1))
+        self._rank = None
+        self._desc_order = None
+
+    @property
+    def rank(self):
+        """Dense rank per row (equal values share a rank, nulls rank last)."""
+        if self._rank is None:
+            valid = self.sorted_keys[:self.n_valid]
+            steps = np.empty(self.n, dtype=np.int64)
+            if self.n_valid:
+                steps[0] = 0
+                steps[1:self.n_valid] = valid[1:] != valid[:-1]
+            steps[self.n_valid:] = 0
+            if self.n_valid < self.n:
+                steps[self.n_valid] = 1
+            rank = np.empty(self.n, dtype=_index_dtype(self.n))
+            rank[self.order] = np.cumsum(steps)
+            self._rank = rank
+        return self._rank
+
+    @property
+    def desc_rank(self):
+        """Rank for descending order, nulls still last."""
+        rank = self.rank
+        top = int(rank.max()) if self.n else 0
+        if self.n_valid < self.n:
+            return np.where(rank == top, top, top - 1 - rank)
+        return top - rank
+
+    def permutation(self, descending=False):
+        """Row positions in sorted order."""
+        if not descending:
+            return self.order
+        if self._desc_order is None:
+            self._desc_order = np.argsort(self.desc_rank, kind='stable').astype(self.order.dtype)
+        return self._desc_order
+
+    def _coerce(self, value):
+        if self.kind == 'date':
+            return pd.Timestamp(value).to_datetime64().astype('datetime64[ns]')
+        if self.kind == 'numeric':
+            return float(value)
+        return value
+
+    def _code_rows(self, codes):
+        codes = [c for c in codes if c >= 0]
+        if not codes:
+            return np.empty(0, dtype=self.order.dtype)
+        return np.concatenate([self.order[self.bounds[c]:self.bounds[c + 1]] for c in codes])
+
+    def _key_slice(self, lo, hi, lo_side='left', hi_side='right'):
+        """Rows whose key lies between lo and hi (None = open), using binary search."""
+        valid = self.sorted_keys[:self.n_valid]
+        start = 0 if lo is None else np.searchsorted(valid, lo, side=lo_side)
+        stop = self.n_valid if hi is None else np.searchsorted(valid, hi, side=hi_side)
+        return self.order[start:max(start, stop)]
+
+    def rows_equal(self, values):
+        """Rows equal to any of `values`."""
+        if self.kind == 'categorical':
+            return self._code_rows(self.uniques.get_indexer(list(values)))
+        parts = [self._key_slice(v, v) for v in map(self._coerce, values)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=self.order.dtype)
+
+    def rows_between(self, lo=None, hi=None):
+        """Rows with lo <= value <= hi (inclusive, either bound optional)."""
+        if self.kind == 'categorical':
+            # Codes are assigned in sorted order, so a value range is a code range
+            start = 0 if lo is None else int(np.searchsorted(self.uniques, lo, side='left'))
+            stop = len(self.uniques) if hi is None else int(np.searchsorted(self.uniques, hi, side='right'))
+            return self.order[self.bounds[start]:self.bounds[max(start, stop)]]
+        lo = None if lo is None else self._coerce(lo)
+        hi = None if hi is None else self._coerce(hi)
+        return self._key_slice(lo, hi)
+
+    def rows_containing(self, text):
+        """Rows whose value contains `text` (case-insensitive). Scans distinct values only."""
+        if self.kind != 'categorical':
+            raise ValueError("'contains' filters only apply to text columns")
+        hits = pd.Index(self.uniques.astype(str)).str.contains(str(text), case=False, regex=False)
+        return self._code_rows(np.flatnonzero(hits))
+
+class DataGrid:
+    """
+    Windowed sort/filter/paging over one dataset version.
+    Column indexes are built on first use and the ordered row ids of recent
+    (filters, sort) combinations are kept, so later pages are plain slices.
+    """
+    def __init__(self, df, cache_size=32):
+        self.df = df
+        self.indexes = {}
+        self.cache_size = cache_size
+        self._results = OrderedDict()
+
+    def index(self, col):
+        if col not in self.df.columns:
+            raise KeyError(f"Unknown column: {col}")
+        if col not in self.indexes:
+            self.indexes[col] = ColumnIndex(self.df[col])
+        return self.indexes[col]
+
+    def _filter_rows(self, col, op, value):
+        idx = self.index(col)
+        if op == 'eq':
+            return idx.rows_equal([value])
+        if op == 'in':
+            return idx.rows_equal(list(value))
+        if op == 'range':
+            lo, hi = value
+            return idx.rows_between(lo, hi)
+        if op == 'contains':
+            return idx.rows_containing(value)
+        raise ValueError(f"Unsupported filter op '{op}'. Use one of: {', '.join(FILTER_OPS)}")
+
+    def _mask(self, filters):
+        """Boolean row mask for AND-ed filters, or None if there are none."""
+        mask = None
+        for col, op, value in filters:
+            hit = np.zeros(len(self.df), dtype=bool)
+            hit[self._filter_rows(col, op, value)] = True
+            mask = hit if mask is None else mask & hit
+        return mask
+
+    def _ordered_rows(self, filters, sort):
+        """Row positions matching `filters` in `sort` order, or None for the identity."""
+        mask = self._mask(filters)
+        if not sort:
+            return None if mask is None else np.flatnonzero(mask)
+        if len(sort) == 1:
+            col, descending = sort[0]
+            perm = self.index(col).permutation(descending)
+            return perm if mask is None else perm[mask[perm]]
+        rows = np.arange(len(self.df)) if mask is None else np.flatnonzero(mask)
+        # np.lexsort treats the last key as primary
+        keys = [self.index(col).desc_rank[rows] if descending else self.index(col).rank[rows]
+                for col, descending in reversed(sort)]
+        return rows[np.lexsort(keys)]
+
+    def query(self, sort=None, filters=None, offset=0, limit=100, fields=None):
+        """
+        Returns (total, page) for one window.
+        sort: list of (column, descending); filters: list of (column, op, value) where op is
+        'eq', 'in' (value is a list), 'range' (value is (min, max), either may be None) or 'contains'.
+        """
+        sort = [(c, bool(d)) for c, d in (sort or [])]
+        filters = [(c, op, tuple(v) if isinstance(v, list) else v) for c, op, v in (filters or [])]
+        key = (tuple(filters), tuple(sort))
+        telemetry.cache_access('grid.rows', key in self._results)
+        if key in self._results:
+            self._results.move_to_end(key)
+            rows = self._results[key]
+        else:
+            rows = self._ordered_rows(filters, sort)
+            self._results[key] = rows
+            if len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+
+        total = len(self.df) if rows is None else len(rows)
+        if fields:
+            missing = [f for f in fields if f not in self.df.columns]
+            if missing:
+                raise KeyError(f"Unknown fields: {', '.join(missing)}")
+        frame = self.df if not fields else self.df[list(fields)]
+        if rows is None:
+            return total, frame.iloc[offset:offset + limit]
+        return total, frame.iloc[rows[offset:offset + limit]]
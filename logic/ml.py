@@ -1,18 +1,77 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier, IsolationForest
-from sklearn.metrics import r2_score, accuracy_score, mean_absolute_error
-from sklearn.preprocessing import LabelEncoder
+from ultimate_excel_ai.logic import telemetry, parallel
+
+# sklearn is imported inside the methods: it is only needed once an ML feature is used
+
+FORECAST_LAGS = 3
+# Backtests training on fewer rows in total (over all folds) run serially:
+# below this, starting worker processes costs more than the fits
+BACKTEST_PARALLEL_MIN_ROWS = 20_000
+
+class LaggedSeries:
+    """
+    A value column summed per date (sorted), with the lag matrix used by the
+    forecaster: row j of X holds the LAGS previous values of y[j].
+    Built once per (date, value) column pair and reused by forecasts and backtests.
+    """
+    def __init__(self, dates, values, lags=FORECAST_LAGS):
+        self.dates = dates
+        self.values = values
+        self.lags = lags
+        n = max(len(values) - lags, 0)
+        self.X = np.column_stack([values[lags - i:lags - i + n] for i in range(1, lags + 1)]) if n else np.empty((0, lags))
+        self.y = values[lags:]
+
+    def __len__(self):
+        return len(self.values)
+
+def prepare_series(df, date_col, value_col, lags=FORECAST_LAGS):
+    """Single groupby pass over the raw rows; see LaggedSeries."""
+    with telemetry.timed('ml.prepare_series'):
+        series = df.groupby(date_col)[value_col].sum().sort_index()
+        return LaggedSeries(series.index, series.to_numpy(dtype=float), lags)
+
+def _new_forecaster():
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(n_estimators=100, random_state=42)
+
+def recursive_forecast(model, history, periods):
+    """Forecasts `periods` steps after `history`, feeding each prediction back in as lag 1."""
+    lags = model.n_features_in_
+    current = list(history[:-lags - 1:-1])  # most recent first
+    forecasts = []
+    for _ in range(periods):
+        pred = model.predict(np.array([current]))[0]
+        forecasts.append(pred)
+        current = [pred] + current[:-1]
+    return forecasts
+
+def _backtest_fold(X, y, values, origin, horizon):
+    """Fits on the series before `origin` and forecasts the next `horizon` values."""
+    lags = X.shape[1]
+    model = _new_forecaster()
+    model.fit(X[:origin - lags], y[:origin - lags])
+    return np.asarray(recursive_forecast(model, values[:origin], horizon))
 
 class MachineLearningEngine:
     def __init__(self):
+        from sklearn.preprocessing import LabelEncoder
         self.predictor_model = None
-        self.forecaster_model = RandomForestRegressor(n_estimators=100, random_state=42)
+        self.forecaster_model = _new_forecaster()
         self.le = LabelEncoder()
 
-    def train_predictor(self, df, target_col):
-        """AutoML for Regression (Numeric) or Classification (Categorical)."""
+    def train_predictor(self, df, target_col, derived=None):
+        """
+        AutoML for Regression (Numeric) or Classification (Categorical).
+        derived: DerivedColumns for df; receives the held-out rows' predictions
+        ({target}_Prediction) and, for regression, residuals ({target}_Residual).
+        """
+        from sklearn.model_selection import train_test_split
+        from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+        from sklearn.metrics import r2_score, accuracy_score, mean_absolute_error
+        n_rows = len(df)
+        rows = np.flatnonzero(df[target_col].notna().to_numpy())
         df = df.dropna(subset=[target_col])
         X = df.drop(columns=[target_col])
         y = df[target_col]
@@ -41,60 +100,118 @@ class MachineLearningEngine:
             y = self.le.fit_transform(y.astype(str))
             
         # Split & Train
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        X_train, X_test, y_train, y_test, _, test_rows = train_test_split(X, y, rows, test_size=0.2, random_state=42)
         
         metrics = {}
         if is_classification:
             self.predictor_model = RandomForestClassifier(n_estimators=100, random_state=42)
-            self.predictor_model.fit(X_train, y_train)
-            preds = self.predictor_model.predict(X_test)
+            with telemetry.timed('ml.train_predictor.fit'):
+                self.predictor_model.fit(X_train, y_train)
+            with telemetry.timed('ml.train_predictor.predict'):
+                preds = self.predictor_model.predict(X_test)
             metrics['accuracy'] = accuracy_score(y_test, preds)
             metrics['type'] = 'Classification'
+            if derived is not None:
+                codes = np.full(n_rows, -1, dtype=np.int32)
+                codes[test_rows] = preds
+                derived.set(f"{target_col}_Prediction", pd.Categorical.from_codes(codes, categories=self.le.classes_))
         else:
             self.predictor_model = RandomForestRegressor(n_estimators=100, random_state=42)
-            self.predictor_model.fit(X_train, y_train)
-            preds = self.predictor_model.predict(X_test)
+            with telemetry.timed('ml.train_predictor.fit'):
+                self.predictor_model.fit(X_train, y_train)
+            with telemetry.timed('ml.train_predictor.predict'):
+                preds = self.predictor_model.predict(X_test)
             metrics['r2_score'] = r2_score(y_test, preds)
             metrics['mae'] = mean_absolute_error(y_test, preds)
             metrics['type'] = 'Regression'
+            if derived is not None:
+                predicted = np.full(n_rows, np.nan)
+                predicted[test_rows] = preds
+                residual = np.full(n_rows, np.nan)
+                residual[test_rows] = np.asarray(y_test, dtype=float) - preds
+                derived.set(f"{target_col}_Prediction", predicted)
+                derived.set(f"{target_col}_Residual", residual)
             
         return self.predictor_model, metrics
 
-    def forecast_series(self, df, date_col, value_col, periods=30, freq='D'):
-        """Time Series Forecasting using Lag-based Random Forest."""
-        df_agg = df.groupby(date_col)[value_col].sum().reset_index()
-        df_agg = df_agg.sort_values(date_col)
-        df_agg.set_index(date_col, inplace=True)
+    def forecast_series(self, df, date_col, value_col, periods=30, freq='D', series=None):
+        """
+        Time Series Forecasting using Lag-based Random Forest.
+        series: LaggedSeries from prepare_series, to skip re-aggregating df.
+        """
+        series = series if series is not None else prepare_series(df, date_col, value_col)
+        if not len(series.y): return None
         
-        for i in range(1, 4):
-            df_agg[f'lag_{i}'] = df_agg[value_col].shift(i)
-        df_agg.dropna(inplace=True)
+        with telemetry.timed('ml.forecast_series.fit'):
+            self.forecaster_model.fit(series.X, series.y)
         
-        if df_agg.empty: return None
+        future_dates = pd.date_range(start=series.dates[-1], periods=periods + 1, freq=freq)[1:]
+        with telemetry.timed('ml.forecast_series.predict'):
+            forecasts = recursive_forecast(self.forecaster_model, series.values, periods)
             
-        X = df_agg[[c for c in df_agg.columns if 'lag' in c]]
-        y = df_agg[value_col]
-        
-        self.forecaster_model.fit(X, y)
+        return pd.DataFrame({'Date': future_dates, 'Forecast': forecasts})
+
+    def backtest_series(self, df, date_col, value_col, horizon=7, folds=5, step=None, min_train=10,
+                        series=None, max_workers=None):
+        """
+        Rolling-origin backtest of forecast_series: `folds` origins spaced `step`
+        (default: horizon) apart, the last one `horizon` values before the end. Each
+        fold refits on the values before its origin and forecasts `horizon` steps;
+        folds run in parallel worker processes once their training rows add up to
+        BACKTEST_PARALLEL_MIN_ROWS.
+        Returns (metrics, predictions): per-horizon MAE/MAPE (MAPE skips zero actuals)
+        and every fold's forecasts next to the actuals; None if the series is too short.
+        """
+        series = series if series is not None else prepare_series(df, date_col, value_col)
+        step = step or horizon
+        last = len(series) - horizon
+        origins = [o for o in (last - k * step for k in range(folds - 1, -1, -1)) if o - series.lags >= min_train]
+        if not origins: return None
         
-        future_dates = pd.date_range(start=df_agg.index[-1], periods=periods + 1, freq=freq)[1:]
-        forecasts = []
-        current_lags = list(df_agg.iloc[-1][[f'lag_{i}' for i in range(1, 4)]].values)
-        last_val = df_agg.iloc[-1][value_col]
-        current_lags = [last_val] + current_lags[:-1]
+        with telemetry.timed('ml.backtest_series'):
+            rows = sum(o - series.lags for o in origins)
+            workers = parallel.worker_count(len(origins), max_workers) if rows >= BACKTEST_PARALLEL_MIN_ROWS else 1
+            forecasts = parallel.run_tasks(_backtest_fold, [(series.X, series.y, series.values, o, horizon) for o in origins], workers)
         
-        for _ in range(periods):
-            pred = self.forecaster_model.predict([current_lags])[0]
-            forecasts.append(pred)
-            current_lags = [pred] + current_lags[:-1]
-            
-        return pd.DataFrame({'Date': future_dates, 'Forecast': forecasts})
+        predicted = np.vstack(forecasts)
+        actual = np.vstack([series.values[o:o + horizon] for o in origins])
+        errors = np.abs(predicted - actual)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.where(actual != 0, errors / np.abs(actual), np.nan) * 100
+        counts = (~np.isnan(pct)).sum(axis=0)
+        metrics = pd.DataFrame({
+            'horizon': np.arange(1, horizon + 1),
+            'mae': errors.mean(axis=0),
+            'mape': np.where(counts > 0, np.nansum(pct, axis=0) / np.maximum(counts, 1), np.nan),
+            'folds': len(origins),
+        })
+        predictions = pd.DataFrame({
+            'origin': np.repeat(series.dates[np.asarray(origins) - 1], horizon),  # last observed date
+            'date': series.dates[np.concatenate([np.arange(o, o + horizon) for o in origins])],
+            'horizon': np.tile(np.arange(1, horizon + 1), len(origins)),
+            'actual': actual.ravel(),
+            'forecast': predicted.ravel(),
+        })
+        return metrics, predictions
 
-    def detect_anomalies(self, df, numeric_cols, contamination=0.05):
-        """Anomaly Detection via Isolation Forest."""
-        if not numeric_cols: return df
+    def score_anomalies(self, df, numeric_cols, contamination=0.05):
+        """
+        Anomaly Detection via Isolation Forest, without modifying df.
+        Returns (flags, scores): a boolean array per row and a float32 score where
+        higher is more anomalous and > 0 means flagged; None without numeric columns.
+        """
+        if not numeric_cols: return None
+        from sklearn.ensemble import IsolationForest
         iso = IsolationForest(contamination=contamination, random_state=42)
         X = df[numeric_cols].fillna(0)
-        preds = iso.fit_predict(X)
-        df['Is_Anomaly'] = preds == -1
+        with telemetry.timed('ml.detect_anomalies.fit_predict'):
+            # Same decision as fit_predict (-1 where decision_function < 0), scored once
+            scores = -iso.fit(X).decision_function(X)
+        return scores > 0, scores.astype(np.float32)
+
+    def detect_anomalies(self, df, numeric_cols, contamination=0.05):
+        """Adds an Is_Anomaly column to df in place; see score_anomalies to keep df unchanged."""
+        result = self.score_anomalies(df, numeric_cols, contamination)
+        if result is None: return df
+        df['Is_Anomaly'] = result[0]
         return df
@@ -1,4 +1,33 @@
 import re
+from functools import lru_cache
+
+DATE_PARTS = ('year', 'quarter', 'month', 'day')
+
+AGGREGATIONS = [
+    ('count', r'\bcount\b|\bhow many\b|\bnumber of\b'),
+    ('mean', r'\baverage\b|\bmean\b|\bavg\b'),
+    ('median', r'\bmedian\b'),
+    ('max', r'\bmax(?:imum)?\b|\bhighest\b|\blargest\b'),
+    ('min', r'\bmin(?:imum)?\b|\blowest\b|\bsmallest\b'),
+    ('sum', r'\bsum\b|\btotal\b'),
+]
+_AGG_PATTERNS = [(name, re.compile(pattern)) for name, pattern in AGGREGATIONS]
+_GROUP_SPLIT = re.compile(r'\b(?:by|per|for each)\b')
+_FILTER_SPLIT = re.compile(r'\b(?:where|when|with)\b')
+_CONDITION = re.compile(r'^\s*(>=|<=|!=|=|>|<|is not|is|not|equals|after|before|above|below|over|under)?\s*(.+?)\s*$')
+_SEPARATORS = re.compile(r'[\s_-]+')
+_OR = re.compile(r'\bor\b')
+# Words allowed in a group-by phrase besides column mentions ("by region and the month")
+_GROUP_FILLER = {'and', 'the', 'each', 'of'}
+# ... and in the aggregation phrase besides aggregations and column mentions ("what is the total sales")
+_HEAD_FILLER = {'what', 'whats', 'is', 'are', 'was', 'the', 'of', 'a', 'an', 'me', 'show', 'give', 'get', 'find',
+                'tell', 'list', 'calculate', 'compute', 'all', 'rows', 'records'}
+# The noun in "how many orders" / "number of customers" names the rows counted, not a column
+_COUNTED = re.compile(r'\b(?:count(?: of)?|how many|number of)\s+\w+')
+_OPERATORS = {
+    None: '=', 'is': '=', 'equals': '=', 'is not': '!=', 'not': '!=',
+    'after': '>', 'above': '>', 'over': '>', 'before': '<', 'below': '<', 'under': '<',
+}
 
 class AnalysisRequest:
     def __init__(self, action, target_cols, chart_type=None):
@@ -6,13 +35,168 @@ class AnalysisRequest:
         self.target_cols = target_cols
         self.chart_type = chart_type
 
+class QueryPlan:
+    """Aggregation plan: agg(measure) grouped by columns, over rows matching AND-ed filters."""
+    def __init__(self, agg, measure=None, group_by=None, filters=None):
+        self.agg = agg
+        self.measure = measure
+        self.group_by = group_by or []
+        self.filters = filters or []  # (column, op, value)
+
+    def key(self):
+        return (self.agg, self.measure, tuple(self.group_by), tuple(self.filters))
+
+    def to_dict(self):
+        return {
+            'agg': self.agg,
+            'measure': self.measure,
+            'group_by': self.group_by,
+            'filters': [{'column': c, 'op': op, 'value': v} for c, op, v in self.filters]
+        }
+
+    def __repr__(self):
+        return f"QueryPlan({self.to_dict()})"
+
+def normalize_query(query):
+    """Lower-cases and collapses whitespace so equivalent phrasings share cache entries."""
+    return ' '.join(query.lower().replace('?', ' ').split())
+
+def _compact(alias):
+    return _SEPARATORS.sub('', alias)
+
+def _alias_pattern(alias):
+    """Regex for an alias that ignores word separators: 'subcategory' (cleaned from
+    'Sub-Category') also matches 'sub category' and 'sub-category'."""
+    return r'[\s_-]*'.join(map(re.escape, _compact(alias)))
+
+class ColumnMatcher:
+    """
+    Finds column mentions in a query with one compiled regex over all aliases
+    (column names, synonyms and date parts such as 'year'), compared without
+    spaces, hyphens and underscores.
+    """
+    def __init__(self, columns, synonyms=None, date_cols=None):
+        aliases = {}
+        for col in columns:
+            aliases.setdefault(col.lower(), col)
+            aliases.setdefault(col.lower().replace('_', ' '), col)
+        # Date parts of the first date column ("year" -> order_date_year) unless a real column wins
+        if date_cols:
+            for part in DATE_PARTS:
+                aliases.setdefault(part, f"{date_cols[0]}_{part}")
+            for date_col in date_cols:
+                for part in DATE_PARTS:
+                    aliases.setdefault(f"{date_col.lower().replace('_', ' ')} {part}", f"{date_col}_{part}")
+        for alias, col in (synonyms or {}).items():
+            aliases[alias.lower()] = col
+        self.aliases = {}
+        for alias, col in aliases.items():
+            self.aliases.setdefault(_compact(alias), col)
+        # Longest alias first so "order date" wins over "order"
+        alternatives = sorted((a for a in self.aliases if a), key=len, reverse=True)
+        self.pattern = re.compile(r'(?<!\w)(' + '|'.join(map(_alias_pattern, alternatives)) + r')(?!\w)') if alternatives else None
+
+    def find(self, text):
+        """Returns [(start, end, column)] for every mention, left to right."""
+        if self.pattern is None:
+            return []
+        return [(m.start(), m.end(), self.aliases[_compact(m.group(1))]) for m in self.pattern.finditer(text)]
+
+    def columns(self, text):
+        """Distinct columns mentioned in text, in order of appearance."""
+        seen = []
+        for _, _, col in self.find(text):
+            if col not in seen: seen.append(col)
+        return seen
+
+@lru_cache(maxsize=32)
+def _cached_matcher(columns, date_cols):
+    return ColumnMatcher(list(columns), date_cols=list(date_cols))
+
+def get_matcher(numeric_cols, categorical_cols, date_cols):
+    """Compiled matcher for a column set, built once and reused."""
+    return _cached_matcher(tuple(numeric_cols + categorical_cols + date_cols), tuple(date_cols))
+
+def _parse_value(text):
+    text = text.strip().strip('\'"')
+    try:
+        number = float(text)
+        return int(number) if number.is_integer() and '.' not in text else number
+    except ValueError:
+        return text
+
+def _parse_filters(clause, matcher):
+    """AND-ed (column, op, value) conditions; None if a condition names no column or uses OR."""
+    if _OR.search(clause):
+        return None
+    filters = []
+    for part in re.split(r'\band\b|,', clause):
+        if not part.strip(): continue
+        mentions = matcher.find(part)
+        if not mentions: return None
+        _, end, col = mentions[0]
+        m = _CONDITION.match(part[end:])
+        if not m or not m.group(2): return None
+        filters.append((col, _OPERATORS.get(m.group(1), m.group(1)), _parse_value(m.group(2))))
+    return filters
+
+def _unmatched_words(clause, matcher, filler=_GROUP_FILLER):
+    """Words of a phrase that are neither column mentions nor `filler`."""
+    rest, last = [], 0
+    for start, end, _ in matcher.find(clause):
+        rest.append(clause[last:start])
+        last = end
+    rest.append(clause[last:])
+    return [w for w in re.findall(r'\w+', ' '.join(rest)) if w not in filler]
+
+def _unmatched_head_words(head, agg, matcher):
+    """Words of the aggregation phrase that are not aggregations, column mentions or filler."""
+    if agg == 'count':
+        head = _COUNTED.sub(' ', head)
+    for _, pattern in _AGG_PATTERNS:
+        head = pattern.sub(' ', head)
+    return _unmatched_words(head, matcher, _HEAD_FILLER)
+
+def parse_plan(query, numeric_cols, categorical_cols, date_cols, matcher=None):
+    """
+    Parses aggregation questions such as "sum of sales by region where year = 2024"
+    into a QueryPlan. Returns None if no aggregation or measure can be identified,
+    or if a word of the aggregation, group-by or filter phrase cannot be matched
+    ("total sales in 2024", "sum of sales for west") or conditions are joined with
+    OR: answering only part of the question would look right but be wrong.
+    """
+    query = normalize_query(query)
+    matcher = matcher or get_matcher(numeric_cols, categorical_cols, date_cols)
+
+    where = _FILTER_SPLIT.search(query)
+    head, filter_clause = (query[:where.start()], query[where.end():]) if where else (query, '')
+    group = _GROUP_SPLIT.search(head)
+    head, group_clause = (head[:group.start()], head[group.end():]) if group else (head, '')
+    # "... where year = 2024 by region"
+    if not group and filter_clause:
+        group = _GROUP_SPLIT.search(filter_clause)
+        if group:
+            filter_clause, group_clause = filter_clause[:group.start()], filter_clause[group.end():]
+
+    agg = next((name for name, pattern in _AGG_PATTERNS if pattern.search(head)), None)
+    measures = [c for c in matcher.columns(head) if c in numeric_cols]
+    if agg is None:
+        if not measures: return None
+        agg = 'sum'
+    if not measures and agg != 'count': return None
+
+    if _unmatched_head_words(head, agg, matcher) or _unmatched_words(group_clause, matcher): return None
+    filters = _parse_filters(filter_clause, matcher)
+    if filters is None: return None
+    group_by = [c for c in matcher.columns(group_clause) if c not in measures[:1]]
+    return QueryPlan(agg, measures[0] if measures else None, group_by, filters)
+
 def parse_query(query, numeric_cols, categorical_cols, date_cols):
     """
     Parses a natural language query and returns an AnalysisRequest.
     """
     query = query.lower()
-    all_cols = numeric_cols + categorical_cols + date_cols
-    found_cols = [col for col in all_cols if col.replace('_', ' ') in query or col in query]
+    found_cols = get_matcher(numeric_cols, categorical_cols, date_cols).columns(query)
     
     if 'trend' in query or 'over time' in query:
         if date_cols and (found_cols or numeric_cols):
@@ -0,0 +1,50 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Imported once by the forkserver, so pool workers start without cold-importing pandas/sklearn
+PRELOAD = ['ultimate_excel_ai.logic.data', 'ultimate_excel_ai.logic.ml', 'sklearn.ensemble']
+
+_POOLS = {}
+_LOCK = threading.Lock()
+
+def worker_count(tasks, max_workers=None):
+    """Processes worth starting for `tasks` independent jobs (capped at the CPU count)."""
+    return max(1, min(tasks, max_workers or os.cpu_count() or 1))
+
+def _context():
+    # forkserver never forks a multi-threaded parent (e.g. the API server)
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context()
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(PRELOAD)
+    return context
+
+def process_pool(workers):
+    """
+    Long-lived ProcessPoolExecutor with `workers` processes, shared by all callers
+    so the start-up cost is paid once per process rather than once per call.
+    Do not shut it down; use run_tasks, which drops a broken pool.
+    """
+    with _LOCK:
+        pool = _POOLS.get(workers)
+        if pool is None:
+            pool = _POOLS[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=_context())
+        return pool
+
+def run_tasks(fn, tasks, workers):
+    """fn(*args) for every args tuple in `tasks`, in order; on the shared pool if workers > 1."""
+    if workers <= 1:
+        return [fn(*args) for args in tasks]
+    pool = process_pool(workers)
+    try:
+        futures = [pool.submit(fn, *args) for args in tasks]
+        return [f.result() for f in futures]
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory): the next call starts a fresh pool
+        with _LOCK:
+            if _POOLS.get(workers) is pool:
+                del _POOLS[workers]
+        raise
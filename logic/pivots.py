@@ -1,12 +1,15 @@
 import pandas as pd
+from ultimate_excel_ai.logic import sketches, telemetry
 
-def generate_pivot_tables(df, numeric_cols, categorical_cols, date_cols):
-    """Generates pivot tables."""
+@telemetry.instrument('pivots.generate_pivot_tables')
+def generate_pivot_tables(df, numeric_cols, categorical_cols, date_cols, approximate=False):
+    """Generates pivot tables. approximate=True uses a HyperLogLog estimate for the cardinality cutoff."""
     pivots = {}
     
     # Cat vs Numeric
     for cat_col in categorical_cols[:3]:
-        if df[cat_col].nunique() > 50: continue
+        distinct = sketches.approx_distinct(df[cat_col], stop_above=50).value if approximate else df[cat_col].nunique()
+        if distinct > 50: continue
         try:
             pivot = df.pivot_table(index=cat_col, values=numeric_cols, aggfunc='sum')
             pivots[f"{cat_col}_summary"] = pivot
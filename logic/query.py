@@ -0,0 +1,211 @@
+import pandas as pd
+import numpy as np
+from collections import OrderedDict
+from ultimate_excel_ai.logic import nlu, telemetry
+
+# Aggregations that can be re-aggregated from per-group partials
+DECOMPOSABLE = ('sum', 'count', 'mean', 'min', 'max')
+
+def _compare(values, op, value):
+    if op == '=': return values == value
+    if op == '!=': return values != value
+    if op == '>': return values > value
+    if op == '>=': return values >= value
+    if op == '<': return values < value
+    if op == '<=': return values <= value
+    raise ValueError(f"Unsupported operator '{op}'")
+
+class QueryResult:
+    def __init__(self, query, plan, frame, source, cached=False):
+        self.query = query
+        self.plan = plan
+        self.frame = frame
+        self.source = source  # 'preaggregated' or 'raw'
+        self.cached = cached
+
+class QueryEngine:
+    """
+    Executes Data Chat aggregation queries over one dataset version.
+    Filters and grouped aggregations run on factorized codes with numpy/pandas
+    vectorized ops. Queries that only filter and group on dimensions (text, dates,
+    date parts) are answered from a per-dimension-set partial aggregate that is
+    built once and reused. Results are cached per (version, normalized query).
+    """
+    def __init__(self, df, numeric_cols, categorical_cols, date_cols, version=None, synonyms=None,
+                 cache_size=128, max_cube_groups=50000):
+        self.df = df
+        self.num = list(numeric_cols)
+        self.cat = list(categorical_cols)
+        self.date = list(date_cols)
+        self.version = version
+        self.matcher = nlu.ColumnMatcher(self.num + self.cat + self.date, synonyms, self.date)
+        self.cache_size = cache_size
+        self.max_cube_groups = max_cube_groups
+        self._columns = {}
+        self._codes = {}
+        self._cubes = {}
+        self._results = OrderedDict()
+
+    def column(self, name):
+        """A dataset column or a derived date part such as 'order_date_year'."""
+        if name in self.df.columns:
+            return self.df[name]
+        if name not in self._columns:
+            for date_col in self.date:
+                for part in nlu.DATE_PARTS:
+                    if name == f"{date_col}_{part}":
+                        self._columns[name] = getattr(self.df[date_col].dt, part).rename(name)
+            if name not in self._columns:
+                raise KeyError(f"Unknown column: {name}")
+        return self._columns[name]
+
+    def is_dimension(self, name):
+        return name not in self.num
+
+    def factorized(self, name):
+        """(codes, uniques) with sorted uniques; nulls get code -1."""
+        if name not in self._codes:
+            self._codes[name] = pd.factorize(self.column(name), sort=True)
+        return self._codes[name]
+
+    def _coerce(self, series, value):
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return pd.Timestamp(str(value))
+        if pd.api.types.is_numeric_dtype(series):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"'{value}' is not a number for column {series.name}")
+        return str(value).lower()
+
+    def _text_match(self, labels, op, value):
+        return _compare(pd.Index(labels).astype(str).str.lower(), op, value)
+
+    def _raw_mask(self, filters):
+        mask = np.ones(len(self.df), dtype=bool)
+        for col, op, value in filters:
+            series = self.column(col)
+            value = self._coerce(series, value)
+            if isinstance(value, str):
+                # Compare against distinct values only, then map back through the codes
+                codes, uniques = self.factorized(col)
+                hits = np.flatnonzero(self._text_match(uniques, op, value))
+                mask &= np.isin(codes, hits)
+            else:
+                mask &= np.asarray(_compare(series, op, value), dtype=bool)
+        return mask
+
+    def _group_index(self, group_by, rows):
+        """Returns (inverse, first_rows): a dense group id per selected row and one sample row per group."""
+        factors = [self.factorized(col) for col in group_by]
+        if np.prod([float(len(uniques) + 1) for _, uniques in factors]) < 2 ** 62:
+            # Mixed-radix packing keeps label order and needs a single 1-D unique
+            gid = np.zeros(len(rows), dtype=np.int64)
+            for codes, uniques in factors:
+                gid = gid * (len(uniques) + 1) + (codes[rows] + 1)
+            _, first, inverse = np.unique(gid, return_index=True, return_inverse=True)
+        else:
+            stacked = np.column_stack([codes[rows] for codes, _ in factors])
+            _, first, inverse = np.unique(stacked, axis=0, return_index=True, return_inverse=True)
+        return inverse.ravel(), rows[first]
+
+    def _labels(self, group_by, first_rows):
+        return pd.DataFrame({col: self.column(col).iloc[first_rows].to_numpy() for col in group_by})
+
+    def _finish(self, frame, group_by):
+        if group_by:
+            frame = frame.sort_values(group_by, na_position='last', kind='stable')
+        return frame.reset_index(drop=True)
+
+    def _output_name(self, plan):
+        return f"{plan.agg}_{plan.measure}" if plan.measure else 'count'
+
+    def _execute_raw(self, plan):
+        mask = self._raw_mask(plan.filters)
+        rows = np.flatnonzero(mask)
+        if plan.measure:
+            values = pd.Series(self.column(plan.measure).to_numpy()[rows])
+        else:
+            values = pd.Series(np.ones(len(rows)))
+        name = self._output_name(plan)
+        if not plan.group_by:
+            result = len(values) if not plan.measure and plan.agg == 'count' else values.agg(plan.agg)
+            return pd.DataFrame({name: [result]})
+        inverse, first_rows = self._group_index(plan.group_by, rows)
+        agg = 'size' if not plan.measure and plan.agg == 'count' else plan.agg
+        result = values.groupby(inverse).agg(agg).reindex(range(len(first_rows)))
+        frame = self._labels(plan.group_by, first_rows)
+        frame[name] = result.to_numpy()
+        return self._finish(frame, plan.group_by)
+
+    def _cube(self, dims):
+        """Per-group sum/count/min/max of every numeric column over `dims`, or None if too fine-grained."""
+        telemetry.cache_access('query.cubes', dims in self._cubes)
+        if dims not in self._cubes:
+            rows = np.arange(len(self.df))
+            inverse, first_rows = self._group_index(list(dims), rows)
+            cube = None
+            if len(first_rows) <= self.max_cube_groups:
+                partials = self.df[self.num].groupby(inverse).agg(['sum', 'count', 'min', 'max'])
+                partials.columns = [f"{col}__{stat}" for col, stat in partials.columns]
+                cube = pd.concat([self._labels(list(dims), first_rows), partials.reset_index(drop=True)], axis=1)
+                cube['__rows'] = np.bincount(inverse, minlength=len(first_rows))
+            self._cubes[dims] = cube
+        return self._cubes[dims]
+
+    def _execute_cube(self, plan, cube):
+        mask = np.ones(len(cube), dtype=bool)
+        for col, op, value in plan.filters:
+            value = self._coerce(self.column(col), value)
+            if isinstance(value, str):
+                mask &= np.asarray(self._text_match(cube[col], op, value), dtype=bool)
+            else:
+                mask &= np.asarray(_compare(cube[col], op, value), dtype=bool)
+        sub = cube[mask]
+        m = plan.measure
+        parts = sub.groupby(plan.group_by, dropna=False) if plan.group_by else sub
+        if plan.agg == 'count':
+            result = parts[f"{m}__count" if m else '__rows'].sum()
+        elif plan.agg == 'mean':
+            result = parts[f"{m}__sum"].sum() / parts[f"{m}__count"].sum()
+        elif plan.agg == 'sum':
+            result = parts[f"{m}__sum"].sum()
+        else:
+            result = getattr(parts[f"{m}__{plan.agg}"], plan.agg)()
+        name = self._output_name(plan)
+        if not plan.group_by:
+            return pd.DataFrame({name: [result]})
+        frame = result.rename(name).reset_index()
+        return self._finish(frame, plan.group_by)
+
+    def execute(self, plan):
+        """Returns (frame, source) for a QueryPlan."""
+        dims = tuple(sorted(set(plan.group_by) | {c for c, _, _ in plan.filters}))
+        if dims and plan.agg in DECOMPOSABLE and all(self.is_dimension(c) for c in dims):
+            cube = self._cube(dims)
+            if cube is not None:
+                return self._execute_cube(plan, cube), 'preaggregated'
+        return self._execute_raw(plan), 'raw'
+
+    def parse(self, query):
+        return nlu.parse_plan(query, self.num, self.cat, self.date, matcher=self.matcher)
+
+    def ask(self, query):
+        """Parses, executes and caches a natural-language query. Returns a QueryResult or None."""
+        normalized = nlu.normalize_query(query)
+        key = (self.version, normalized)
+        telemetry.cache_access('query.results', key in self._results)
+        if key in self._results:
+            self._results.move_to_end(key)
+            hit = self._results[key]
+            return QueryResult(normalized, hit.plan, hit.frame, hit.source, cached=True)
+
+        plan = self.parse(normalized)
+        if plan is None:
+            return None
+        frame, source = self.execute(plan)
+        result = QueryResult(normalized, plan, frame, source)
+        self._results[key] = result
+        if len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+        return result
@@ -0,0 +1,297 @@
+import math
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+# Sketch sizes: ~1.6% distinct-count error, ~1.3% rank error, 64 tracked items
+HLL_PRECISION = 12
+KLL_K = 200
+TOP_K = 64
+CHUNK_ROWS = 500_000
+
+# An approximate value with lower/upper bounds on the estimated quantity
+Estimate = namedtuple('Estimate', ['value', 'lower', 'upper'])
+
+def hash_values(values):
+    """Stable 64-bit hashes. Numerics are hashed as float64 so int and float chunks agree."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        values = values.astype(np.float64)
+    elif values.dtype.kind == 'M':
+        values = values.astype('datetime64[ns]').view(np.int64)
+    elif values.dtype.kind != 'O':
+        values = values.astype(object)
+    return pd.util.hash_array(values)
+
+def _bit_length(w):
+    """Vectorized bit length of uint64 values (exact: converts at most 53 bits to float)."""
+    hi = w >> np.uint64(11)
+    lengths = np.frexp(hi.astype(np.float64))[1] + 11
+    low = np.frexp((w & np.uint64(0x7FF)).astype(np.float64))[1]
+    return np.where(hi > 0, lengths, low)
+
+class HyperLogLog:
+    """Distinct-count sketch. Merge = element-wise max of registers."""
+    def __init__(self, precision=HLL_PRECISION):
+        self.p = precision
+        self.m = 1 << precision
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, values):
+        values = np.asarray(values)
+        if values.dtype.kind == 'f':
+            values = values[~np.isnan(values)]
+        elif values.dtype.kind in 'OUSM':
+            # Registers only depend on the set of values: hash each distinct value once
+            values = pd.unique(values)
+            values = values[~pd.isna(values)]
+        if len(values) == 0: return
+        h = hash_values(values)
+        idx = (h >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = h << np.uint64(self.p)
+        rho = np.minimum(64 - _bit_length(rest) + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """Estimate with ~95% bounds (2 standard errors)."""
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = float(alpha * self.m ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            raw = self.m * math.log(self.m / zeros)  # Linear counting for small cardinalities
+        err = 2 * 1.04 / math.sqrt(self.m) * raw
+        return Estimate(raw, max(0.0, raw - err), raw + err)
+
+def approx_distinct(series, precision=HLL_PRECISION, chunk_rows=CHUNK_ROWS, stop_above=None):
+    """
+    Distinct non-null values of a Series from a chunked HyperLogLog pass.
+    stop_above: return as soon as the estimate's lower bound exceeds this count
+    (chunks start small and double, so high-cardinality columns stop early).
+    """
+    hll = HyperLogLog(precision)
+    start, size = 0, chunk_rows if stop_above is None else min(chunk_rows, 16_384)
+    while start < len(series):
+        hll.update(np.asarray(series.iloc[start:start + size].array))
+        start, size = start + size, min(chunk_rows, size * 2)
+        if stop_above is not None and hll.estimate().lower > stop_above:
+            break
+    return hll.estimate()
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (Karnin-Lang-Liberty). Items at level h carry weight 2**h;
+    full levels are sorted and halved with a random offset.
+    """
+    def __init__(self, k=KLL_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        # Adding a level shrinks the capacity of the ones below, so repeat until all fit
+        while True:
+            full = [h for h, items in enumerate(self.levels) if len(items) > self._capacity(h)]
+            if not full: return
+            h = full[0]
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            items = items[:len(items) - len(keep)]
+            promoted = items[int(self._rng.integers(2))::2]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            self.levels[h] = keep
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values): return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    @property
+    def rank_error(self):
+        """Normalized rank error (0 while nothing has been compacted)."""
+        if len(self.levels) == 1: return 0.0
+        return 2.296 / self.k ** 0.9723
+
+    def _quantile(self, q, items, cum):
+        target = min(max(q, 0.0), 1.0) * cum[-1]
+        return float(items[min(np.searchsorted(cum, target, side='left'), len(items) - 1)])
+
+    def quantile(self, q):
+        """Value at quantile q with bounds at q -/+ the rank error."""
+        if self.n == 0:
+            return Estimate(np.nan, np.nan, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(v), 2.0 ** h) for h, v in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cum = items[order], np.cumsum(weights[order])
+        eps = self.rank_error
+        return Estimate(self._quantile(q, items, cum), self._quantile(q - eps, items, cum), self._quantile(q + eps, items, cum))
+
+    def median(self):
+        return self.quantile(0.5)
+
+class HeavyHitters:
+    """
+    Misra-Gries frequent items. Counts are under-estimated by at most `offset`,
+    which grows by the evicted count on every trim and adds up on merge.
+    """
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.n = 0
+        self.offset = 0
+        self.counts = pd.Series(dtype=np.int64)
+
+    def _absorb(self, counts):
+        combined = self.counts.add(counts, fill_value=0)
+        if len(combined) > self.k:
+            cut = combined.nlargest(self.k + 1).iloc[-1]
+            combined = combined[combined > cut] - cut
+            self.offset += int(cut)
+        self.counts = combined.astype(np.int64)
+
+    def update(self, values):
+        codes, uniques = pd.factorize(np.asarray(values))
+        counts = np.bincount(codes + 1, minlength=len(uniques) + 1)[1:]  # code -1 = null
+        self.n += int(counts.sum())
+        # Only the chunk's k+1 most frequent items and the tracked ones can survive the trim
+        keep = np.argpartition(counts, -(self.k + 1))[-(self.k + 1):] if len(counts) > self.k + 1 else np.arange(len(counts))
+        tracked = pd.Index(uniques).get_indexer(self.counts.index)
+        keep = np.union1d(keep, tracked[tracked >= 0])
+        self._absorb(pd.Series(counts[keep], index=pd.Index(uniques).take(keep)))
+
+    def merge(self, other):
+        self.n += other.n
+        self.offset += other.offset
+        self._absorb(other.counts)
+        return self
+
+    def top(self, n=10):
+        """[(item, Estimate(count, lower, upper))] by estimated frequency."""
+        best = self.counts.nlargest(n)
+        return [(item, Estimate(int(c), int(c), int(c) + self.offset)) for item, c in best.items()]
+
+    def mode(self):
+        top = self.top(1)
+        return top[0] if top else (None, Estimate(0, 0, 0))
+
+class ColumnSketch:
+    """
+    Quantiles for numerics, frequent items for the rest and, unless
+    distinct=False, a distinct count.
+    """
+    def __init__(self, numeric, precision=HLL_PRECISION, k=KLL_K, top_k=TOP_K, distinct=True):
+        self.numeric = numeric
+        self.rows = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog(precision) if distinct else None
+        self.quantiles = KLLSketch(k) if numeric else None
+        self.frequent = None if numeric else HeavyHitters(top_k)
+
+    def update(self, series):
+        # Both sketches skip nulls themselves; their counts give the null count
+        # np.asarray(series.array) avoids the copy to_numpy() makes of string columns
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan) if self.numeric else np.asarray(series.array)
+        values_sketch = self.quantiles if self.numeric else self.frequent
+        before = values_sketch.n
+        values_sketch.update(values)
+        self.rows += len(values)
+        self.nulls += len(values) - (values_sketch.n - before)
+        if self.distinct is not None:
+            self.distinct.update(values)
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        if self.distinct is not None and other.distinct is not None:
+            self.distinct.merge(other.distinct)
+        else:
+            self.distinct = None
+        if self.numeric:
+            self.quantiles.merge(other.quantiles)
+        else:
+            self.frequent.merge(other.frequent)
+        return self
+
+class DatasetSketch:
+    """
+    Per-column sketches built in one streaming pass over row chunks.
+    Sketches of separate chunks, files or appends can be merged.
+    """
+    def __init__(self, numeric_cols=(), categorical_cols=(), **kwargs):
+        self.rows = 0
+        self.options = kwargs
+        self.columns = {}
+        self.add_columns(numeric_cols, categorical_cols)
+
+    def add_columns(self, numeric_cols, categorical_cols, frames=(), chunk_rows=CHUNK_ROWS):
+        """Starts sketches for new columns, filled from the rows of `frames` that have them."""
+        kinds = [(col, True) for col in numeric_cols] + [(col, False) for col in categorical_cols]
+        for col, numeric in kinds:
+            sketch = ColumnSketch(numeric, **self.options)
+            for frame in frames:
+                if col in frame.columns:
+                    for start in range(0, len(frame), chunk_rows):
+                        sketch.update(frame[col].iloc[start:start + chunk_rows])
+            self.columns[col] = sketch
+        return self
+
+    def update(self, df):
+        """Adds the rows of df to the sketched columns it contains."""
+        for col, sketch in self.columns.items():
+            if col in df.columns:
+                sketch.update(df[col])
+        self.rows += len(df)
+        return self
+
+    def merge(self, other):
+        for col, sketch in other.columns.items():
+            if col in self.columns and self.columns[col].numeric != sketch.numeric:
+                raise ValueError(f"Cannot merge sketches of column '{col}': numeric in one, categorical in the other")
+            if col in self.columns:
+                self.columns[col].merge(sketch)
+            else:
+                self.columns[col] = sketch
+        self.rows += other.rows
+        return self
+
+    @classmethod
+    def from_frame(cls, df, numeric_cols, categorical_cols, chunk_rows=CHUNK_ROWS, **kwargs):
+        sketch = cls(numeric_cols, categorical_cols, **kwargs)
+        for start in range(0, len(df), chunk_rows):
+            sketch.update(df.iloc[start:start + chunk_rows])
+        return sketch
+
+    def distinct(self, col):
+        if self.columns[col].distinct is None:
+            raise ValueError(f"Distinct count of '{col}' is not tracked")
+        return self.columns[col].distinct.estimate()
+
+    def median(self, col):
+        return self.columns[col].quantiles.median()
+
+    def mode(self, col):
+        return self.columns[col].frequent.mode()
@@ -0,0 +1,177 @@
+import functools
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Seconds; covers cheap lookups up to long model fits
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    if not labels: return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+def _fmt(value):
+    return repr(float(value)) if not isinstance(value, int) else str(value)
+
+class Registry:
+    """
+    Thread-safe counters, gauges and histograms rendered in the Prometheus text format.
+    Gauges may also be callbacks evaluated at render time.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}        # name -> (type, help)
+        self._counters = {}    # (name, labels) -> value
+        self._gauges = {}
+        self._histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self._buckets = {}
+        self._callbacks = {}   # name -> fn() -> number or [(labels dict, value)]
+
+    def _declare(self, name, kind, help_text):
+        if name not in self._meta:
+            self._meta[name] = (kind, help_text or name)
+
+    def inc(self, name, value=1, help=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, 'counter', help)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, help=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, 'gauge', help)
+            self._gauges[key] = value
+
+    def add(self, name, value, help=None, **labels):
+        """Adjusts a gauge by `value` (e.g. +1/-1 for in-flight work)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, 'gauge', help)
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name, value, help=None, buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, 'histogram', help)
+            self._buckets.setdefault(name, buckets)
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * len(self._buckets[name]), 0.0, 0]
+            for i, bound in enumerate(self._buckets[name]):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def gauge_callback(self, name, fn, help=None):
+        with self._lock:
+            self._declare(name, 'gauge', help)
+            self._callbacks[name] = fn
+
+    def value(self, name, **labels):
+        """Current counter or gauge value (0 if unset)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()}
+            callbacks = dict(self._callbacks)
+            meta = dict(self._meta)
+        for name, fn in callbacks.items():
+            try:
+                result = fn()
+            except Exception:
+                continue
+            if isinstance(result, (int, float)):
+                result = [({}, result)]
+            for labels, value in result:
+                gauges[(name, tuple(sorted(labels.items())))] = value
+
+        lines = []
+        for name in sorted(meta):
+            kind, help_text = meta[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'histogram':
+                for (n, labels), (counts, total, count) in sorted(histograms.items()):
+                    if n != name: continue
+                    # observe() increments every bucket >= value, so counts are already cumulative
+                    for bound, c in zip(self._buckets[name], counts):
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', repr(float(bound))),))} {c}")
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_fmt(total)}")
+                    lines.append(f"{name}_count{_labels(labels)} {count}")
+            else:
+                source = counters if kind == 'counter' else gauges
+                for (n, labels), value in sorted(source.items()):
+                    if n == name:
+                        lines.append(f"{name}{_labels(labels)} {_fmt(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+_alloc = threading.local()
+_tracking = False
+
+def enable_allocation_tracking(enabled=True):
+    """Turns tracemalloc-based peak allocation tracking of timed stages on or off."""
+    global _tracking
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _tracking = enabled
+
+@contextmanager
+def timed(stage, registry=None):
+    """
+    Records the duration of a stage (and, when tracking is on, its peak traced
+    allocation above the starting point). Nested stages keep the outer peak intact.
+    tracemalloc is process-wide, so peaks of concurrent stages overlap.
+    """
+    registry = registry or REGISTRY
+    track = _tracking and tracemalloc.is_tracing()
+    if track:
+        stack = _alloc.__dict__.setdefault('stack', [])
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        stack.append([current, 0])
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe('stage_duration_seconds', time.perf_counter() - start,
+                         help="Duration of instrumented pipeline stages", stage=stage)
+        if track:
+            _, peak = tracemalloc.get_traced_memory()
+            base, inner_peak = stack.pop()
+            peak = max(peak, inner_peak)
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            registry.set('stage_peak_alloc_bytes', max(0, peak - base),
+                         help="Peak traced allocation of the last run of a stage", stage=stage)
+
+def instrument(stage):
+    """Decorator form of timed()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def cache_access(cache, hit, registry=None):
+    (registry or REGISTRY).inc('cache_requests_total', help="Cache lookups by cache and result",
+                               cache=cache, result='hit' if hit else 'miss')
@@ -0,0 +1,26 @@
+from ultimate_excel_ai.logic import nlu
+
+NUM = ['sales', 'quantity', 'discount', 'profit']
+CAT = ['region', 'category', 'subcategory']
+DATE = ['order_date']
+
+def plan(query):
+    result = nlu.parse_plan(query, NUM, CAT, DATE)
+    return result and result.to_dict()
+
+def test_parses_aggregation_group_and_filter():
+    assert plan("what is the total sales by region where year = 2024") == {
+        'agg': 'sum', 'measure': 'sales', 'group_by': ['region'],
+        'filters': [{'column': 'order_date_year', 'op': '=', 'value': 2024}],
+    }
+
+def test_counted_noun_is_not_a_leftover():
+    assert plan("how many orders by region")['group_by'] == ['region']
+
+def test_rejects_unmatched_words_in_aggregation_phrase():
+    assert plan("total sales in 2024 by region") is None
+    assert plan("sum of sales for west") is None
+
+def test_rejects_unmatched_group_and_or_filters():
+    assert plan("sum of sales by region in 2024") is None
+    assert plan("sum of sales where region = east or region = west") is None
@@ -0,0 +1,33 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from ultimate_excel_ai.api import serialization
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serialization, "_orjson", lambda: None)
+
+def test_frame_to_json_round_trips_numbers(encoder):
+    floats = [1e-12, 1.2345678901e-7, 1 / 3, 123456789.123456789, 1e300, -0.0, 5e-324]
+    df = pd.DataFrame({
+        "tiny_and_large": floats,
+        "with_nan": floats[:-1] + [np.nan],
+        "count": pd.array([1, None, 2 ** 62, 3, 4, 5, 6], dtype="Int64"),
+        "id": np.arange(len(floats), dtype="int64") + 2 ** 53,
+        "share": pd.array([0.1, None, 1e-12, 1, 2, 3, 4], dtype="Float64"),
+    })
+    decoded = json.loads(serialization.frame_to_json(df))
+    assert decoded["tiny_and_large"] == floats
+    assert decoded["with_nan"] == floats[:-1] + [None]
+    assert decoded["count"] == [1, None, 2 ** 62, 3, 4, 5, 6]
+    assert all(isinstance(v, int) for v in decoded["count"] if v is not None)
+    assert decoded["id"] == [2 ** 53 + i for i in range(len(floats))]
+    assert decoded["share"] == [0.1, None, 1e-12, 1.0, 2.0, 3.0, 4.0]
+
+def test_frame_to_json_encodes_infinity_as_null(encoder):
+    decoded = json.loads(serialization.frame_to_json(pd.DataFrame({"x": [np.inf, -np.inf, 1.5]})))
+    assert decoded["x"] == [None, None, 1.5]
@@ -1,16 +1,33 @@
 import requests
-import pandas as pd
 import io
 import json
 
 class APIClient:
-    def __init__(self, base_url):
+    def __init__(self, base_url, client_id=None):
+        """client_id: sent as X-Client-ID, the key of the API's per-client admission limits."""
         self.base_url = base_url.rstrip('/')
+        self.http = requests.Session()
+        if client_id:
+            self.http.headers['X-Client-ID'] = client_id
 
-    def upload_file(self, file_obj, filename):
+    def upload_file(self, file_obj, filename, approximate=False):
         files = {'file': (filename, file_obj, 'application/octet-stream')}
         try:
-            response = requests.post(f"{self.base_url}/upload", files=files)
+            response = self.http.post(f"{self.base_url}/upload", files=files, params={"approximate": approximate})
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def upload_batch(self, named_files, name=None, concat=True, all_sheets=False, join="outer",
+                     source_column=None, approximate=False):
+        """named_files: list of (filename, file_obj)."""
+        files = [('files', (filename, file_obj, 'application/octet-stream')) for filename, file_obj in named_files]
+        params = {"concat": concat, "all_sheets": all_sheets, "join": join, "approximate": approximate}
+        if name: params["name"] = name
+        if source_column: params["source_column"] = source_column
+        try:
+            response = self.http.post(f"{self.base_url}/upload/batch", files=files, params=params)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -18,7 +35,7 @@ class APIClient:
 
     def analyze(self, filename):
         try:
-            response = requests.post(f"{self.base_url}/analyze", params={"filename": filename})
+            response = self.http.post(f"{self.base_url}/analyze", params={"filename": filename})
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -27,7 +44,7 @@ class APIClient:
     def predict(self, filename, target_col):
         payload = {"filename": filename, "target_column": target_col}
         try:
-            response = requests.post(f"{self.base_url}/predict", json=payload)
+            response = self.http.post(f"{self.base_url}/predict", json=payload)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -41,15 +58,81 @@ class APIClient:
             "periods": periods
         }
         try:
-            response = requests.post(f"{self.base_url}/forecast", json=payload)
+            response = self.http.post(f"{self.base_url}/forecast", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def backtest(self, filename, date_col, target_col, horizon=7, folds=5, step=None):
+        payload = {
+            "filename": filename,
+            "date_column": date_col,
+            "target_column": target_col,
+            "horizon": horizon,
+            "folds": folds,
+            "step": step
+        }
+        try:
+            response = self.http.post(f"{self.base_url}/backtest", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def detect_anomalies(self, filename, limit=100, cursor=None, fields=None):
+        params = {"filename": filename, "limit": limit}
+        if cursor: params["cursor"] = cursor
+        if fields: params["fields"] = ",".join(fields)
+        try:
+            response = self.http.post(f"{self.base_url}/anomalies", params=params)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def derived_rows(self, filename, columns=None, where=None, limit=100, cursor=None, fields=None):
+        params = {"filename": filename, "limit": limit}
+        if columns: params["columns"] = ",".join(columns)
+        if where: params["where"] = where
+        if cursor: params["cursor"] = cursor
+        if fields: params["fields"] = ",".join(fields)
+        try:
+            response = self.http.post(f"{self.base_url}/derived", params=params)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def rows(self, filename, offset=0, limit=100, sort=None, filters=None, fields=None):
+        payload = {
+            "filename": filename,
+            "offset": offset,
+            "limit": limit,
+            "sort": sort or [],
+            "filters": filters or [],
+            "fields": fields
+        }
+        try:
+            response = self.http.post(f"{self.base_url}/rows", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def query(self, filename, question):
+        payload = {"filename": filename, "query": question}
+        try:
+            response = self.http.post(f"{self.base_url}/query", json=payload)
             response.raise_for_status()
             return response.json()
         except Exception as e:
             return {"error": str(e)}
 
-    def detect_anomalies(self, filename):
+    def find_duplicates(self, filename, subset=None, verify=False, limit=100):
+        payload = {"filename": filename, "subset": subset, "verify": verify, "limit": limit}
         try:
-            response = requests.post(f"{self.base_url}/anomalies", params={"filename": filename})
+            response = self.http.post(f"{self.base_url}/duplicates", json=payload)
             response.raise_for_status()
             return response.json()
         except Exception as e:
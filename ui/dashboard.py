@@ -1,22 +1,40 @@
 import streamlit as st
-import pandas as pd
 import io
 import os
-import plotly.express as px
+import uuid
+from ultimate_excel_ai import lazy
 
-# Import Local Logic
-from ultimate_excel_ai.logic import data, ml, analysis, charts, nlu, export
+# Import Local Logic (loaded on first use, so the first page renders before pandas/sklearn/plotly)
+pd = lazy.module("pandas")
+data = lazy.module("ultimate_excel_ai.logic.data")
+ml = lazy.module("ultimate_excel_ai.logic.ml")
+analysis = lazy.module("ultimate_excel_ai.logic.analysis")
+charts = lazy.module("ultimate_excel_ai.logic.charts")
+nlu = lazy.module("ultimate_excel_ai.logic.nlu")
+export = lazy.module("ultimate_excel_ai.logic.export")
+query = lazy.module("ultimate_excel_ai.logic.query")
+derived = lazy.module("ultimate_excel_ai.logic.derived")
 # Import API Client
 from ultimate_excel_ai.ui.api_client import APIClient
 
 APP_MODE = 'SAAS' if os.getenv('API_URL') else 'LOCAL'
-if APP_MODE == 'SAAS':
-    api = APIClient(os.getenv('API_URL'))
+
+def get_api():
+    """
+    API client of this browser session. All sessions reach the API from this server's
+    address, so each sends its own X-Client-ID to get its own admission budget (the API
+    honours it with TRUSTED_PROXIES or ADMISSION_TRUST_CLIENT_ID, see README).
+    """
+    if 'api' not in st.session_state:
+        st.session_state['api'] = APIClient(os.getenv('API_URL'), client_id=f"ui-{uuid.uuid4().hex}")
+    return st.session_state['api']
 
 def render_dashboard():
+    api = get_api() if APP_MODE == 'SAAS' else None
     # Sidebar
     st.sidebar.title(f"Ultimate Excel AI ({APP_MODE}) 🚀")
     uploaded_file = st.sidebar.file_uploader("Upload Excel/CSV", type=['csv', 'xlsx', 'xls'])
+    approximate = st.sidebar.checkbox("Approximate mode (large files)", help="Use sketches for medians, modes and distinct counts")
     
     if uploaded_file:
         # Load & Process
@@ -26,7 +44,7 @@ def render_dashboard():
                     # LOCAL MODE
                     df, msg = data.load_data(uploaded_file, uploaded_file.name)
                     if df is not None:
-                        df, num, cat, date, stats = data.process_data(df)
+                        df, num, cat, date, stats = data.process_data(df, approximate=approximate)
                         st.session_state['df'] = df
                         st.session_state['num'] = num
                         st.session_state['cat'] = cat
@@ -43,7 +61,7 @@ def render_dashboard():
                     # We need to send the file to the backend
                     # Reset pointer for upload
                     uploaded_file.seek(0)
-                    resp = api.upload_file(uploaded_file, uploaded_file.name)
+                    resp = api.upload_file(uploaded_file, uploaded_file.name, approximate=approximate)
                     if "error" not in resp:
                         # For SaaS, we mostly rely on backend, but for Streamlit visualization
                         # we still need the DF locally. Ideally, backend returns JSON data,
@@ -55,7 +73,7 @@ def render_dashboard():
                         # Process locally for UI responsiveness
                         uploaded_file.seek(0)
                         df, _ = data.load_data(uploaded_file, uploaded_file.name)
-                        df, num, cat, date, stats = data.process_data(df)
+                        df, num, cat, date, stats = data.process_data(df, approximate=approximate)
                         
                         st.session_state['df'] = df
                         st.session_state['num'] = num
@@ -74,6 +92,10 @@ def render_dashboard():
         cat_cols = st.session_state['cat']
         date_cols = st.session_state['date']
         filename = st.session_state.get('filename')
+        # Analysis results (anomaly flags, predictions) are kept as arrays next to df, not as copies of it
+        if st.session_state.get('derived') is None or st.session_state['derived'].base is not df:
+            st.session_state['derived'] = derived.DerivedColumns(df, version=filename)
+        results = st.session_state['derived']
         
         # Tabs
         tabs = st.tabs(["Overview", "Predictive Analytics", "Smart Insights", "Data Chat", "Reports"])
@@ -163,7 +185,7 @@ def render_dashboard():
             if st.button("Train Model"):
                 if APP_MODE == 'LOCAL':
                     engine = ml.MachineLearningEngine()
-                    model, metrics = engine.train_predictor(df, target)
+                    model, metrics = engine.train_predictor(df, target, derived=results)
                 else:
                     resp = api.predict(filename, target)
                     if "error" not in resp:
@@ -181,39 +203,37 @@ def render_dashboard():
             st.divider()
             st.subheader("Anomaly Detection")
             if st.button("Detect Anomalies"):
+                scored = None
                 if APP_MODE == 'LOCAL':
                     engine = ml.MachineLearningEngine()
-                    df_anom = engine.detect_anomalies(df.copy(), num_cols)
-                    anom_count = df_anom['Is_Anomaly'].sum()
-                    anoms = df_anom
+                    scored = engine.score_anomalies(df, num_cols)
                 else:
                     resp = api.detect_anomalies(filename)
                     if "error" not in resp:
-                        anom_count = resp['anomaly_count']
-                        # Reconstruct anomaly DF locally for plotting (visual only)
-                        # In real app we might fetch full DF, here we just visualize what we have
-                        # using local logic for plot, but show API count
-                        anoms = df.copy() # Placeholder for full plotting if not fetching all
-                        st.info("API Verification: Backend detected same anomalies.")
+                        st.info(f"API Verification: Backend detected {resp['anomaly_count']} anomalies.")
                         
                         # Visualize locally
                         engine = ml.MachineLearningEngine()
-                        anoms = engine.detect_anomalies(df.copy(), num_cols)
+                        scored = engine.score_anomalies(df, num_cols)
                     else:
                         st.error(resp['error'])
-                        anoms = None
                 
-                if anoms is not None:
-                    st.session_state['anomaly_df'] = anoms
-                    st.write(f"Detected {anoms['Is_Anomaly'].sum()} anomalies.")
+                if scored is not None:
+                    flags, scores = scored
+                    results.set('Anomaly_Score', scores)
+                    results.set('Is_Anomaly', flags)
+                    st.write(f"Detected {flags.sum()} anomalies.")
                     if len(num_cols) >= 2:
-                        st.plotly_chart(charts.generate_scatter_chart(anoms, num_cols[0], num_cols[1], 'Is_Anomaly'), use_container_width=True)
+                        plot_df = results.view(columns=num_cols[:2], derived=['Is_Anomaly'])
+                        st.plotly_chart(charts.generate_scatter_chart(plot_df, num_cols[0], num_cols[1], 'Is_Anomaly'), use_container_width=True)
+                elif not num_cols:
+                    st.warning("Anomaly detection needs numeric columns.")
 
         # 3. Smart Insights
         with tabs[2]:
             st.markdown("### 💡 Smart Insights")
             if APP_MODE == 'LOCAL':
-                insights = analysis.generate_insights(df, num_cols, date_cols)
+                insights = analysis.generate_insights(df, num_cols, date_cols, approximate=approximate)
             else:
                 resp = api.analyze(filename)
                 insights = resp.get('insights', []) if "error" not in resp else [resp['error']]
@@ -232,29 +252,43 @@ def render_dashboard():
             q = st.text_input("Ask a question about your data...")
             if q:
                 req = nlu.parse_query(q, num_cols, cat_cols, date_cols)
-                if req:
+                if req and req.action == 'plot':
                     st.success(f"Action: {req.action}, Chart: {req.chart_type}, Cols: {req.target_cols}")
-                    if req.action == 'plot':
-                        if req.chart_type == 'line': st.plotly_chart(charts.generate_line_chart(df, req.target_cols[1], req.target_cols[0]), use_container_width=True)
-                        elif req.chart_type == 'bar': st.plotly_chart(charts.generate_bar_chart(df, req.target_cols[0], req.target_cols[1]), use_container_width=True)
-                        elif req.chart_type == 'hist': st.plotly_chart(charts.generate_distribution_chart(df, req.target_cols[0]), use_container_width=True)
-                        elif req.chart_type == 'heatmap': st.plotly_chart(charts.generate_correlation_heatmap(df, num_cols), use_container_width=True)
-                else: st.warning("I didn't understand the query. Try asking for 'trend of sales' or 'distribution of profit'.")
+                    if req.chart_type == 'line': st.plotly_chart(charts.generate_line_chart(df, req.target_cols[1], req.target_cols[0]), use_container_width=True)
+                    elif req.chart_type == 'bar': st.plotly_chart(charts.generate_bar_chart(df, req.target_cols[0], req.target_cols[1]), use_container_width=True)
+                    elif req.chart_type == 'hist': st.plotly_chart(charts.generate_distribution_chart(df, req.target_cols[0]), use_container_width=True)
+                    elif req.chart_type == 'heatmap': st.plotly_chart(charts.generate_correlation_heatmap(df, num_cols), use_container_width=True)
+                else:
+                    # Aggregation questions ("sum of sales by region where year = 2024")
+                    if APP_MODE == 'LOCAL':
+                        if st.session_state.get('query_engine_file') != st.session_state.get('last_file'):
+                            st.session_state['query_engine'] = query.QueryEngine(df, num_cols, cat_cols, date_cols, version=st.session_state.get('last_file'))
+                            st.session_state['query_engine_file'] = st.session_state.get('last_file')
+                        result = st.session_state['query_engine'].ask(q)
+                        answer = None if result is None else (result.plan.to_dict(), result.frame, result.source)
+                    else:
+                        resp = api.query(filename, q)
+                        answer = None if "error" in resp else (resp['plan'], pd.DataFrame(resp['result']), resp['source'])
+                    if answer:
+                        plan, result_df, source = answer
+                        st.success(f"Aggregation: {plan['agg']} of {plan['measure'] or 'rows'}" + (f" by {', '.join(plan['group_by'])}" if plan['group_by'] else "") + f" ({source})")
+                        st.dataframe(result_df, use_container_width=True)
+                    else: st.warning("I didn't understand the query. Try asking for 'trend of sales', 'distribution of profit' or 'sum of sales by region'.")
 
         # 5. Reports
         with tabs[4]:
             st.header("Download Reports")
             from ultimate_excel_ai.logic import pivots
             
-            pivot_data = pivots.generate_pivot_tables(df, num_cols, cat_cols, date_cols)
-            insights = analysis.generate_insights(df, num_cols, date_cols) # Regenerate for fresh report
+            pivot_data = pivots.generate_pivot_tables(df, num_cols, cat_cols, date_cols, approximate=approximate)
+            insights = analysis.generate_insights(df, num_cols, date_cols, approximate=approximate) # Regenerate for fresh report
             
             excel_data = export.generate_excel_report(
                 df, pivot_data, 
                 st.session_state.get('forecast_df'),
-                st.session_state.get('anomaly_df'),
-                st.session_state.get('model_metrics'),
-                insights
+                model_metrics=st.session_state.get('model_metrics'),
+                insights=insights,
+                derived=results
             )
             
             st.download_button("📥 Download Excel Report", excel_data, "report.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")